@@ -1,9 +1,13 @@
 from datetime import datetime, timedelta
+from functools import wraps
 import os
+import sys
 
-from flask import Flask, request, jsonify
+import click
+from flask import Flask, Response, request, jsonify
 from flask_sqlalchemy import SQLAlchemy
 from flask_bcrypt import Bcrypt
+from sqlalchemy.exc import IntegrityError
 from flask_jwt_extended import (
     JWTManager,
     create_access_token,
@@ -11,6 +15,10 @@ from flask_jwt_extended import (
     get_jwt_identity,
 )
 
+import cache as cache_backend
+import export
+from ratelimit import RateLimiter
+
 # -------------------------------------------------
 # App & extensions
 # -------------------------------------------------
@@ -20,13 +28,38 @@ app = Flask(__name__, static_folder=".", static_url_path="")
 
 app.config["SECRET_KEY"] = "super-secret-change-me"
 app.config["JWT_SECRET_KEY"] = "super-secret-jwt-change-me"
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///iq.db"
+app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get(
+    "DATABASE_URL", "sqlite:///iq.db"
+)
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(days=7)
+# comma separated usernames allowed to use /api/admin/*
+app.config["ADMIN_USERNAMES"] = [
+    name.strip()
+    for name in os.environ.get("IQ_ADMIN_USERNAMES", "").split(",")
+    if name.strip()
+]
+# Shared cache / state: sqlite:///path (one box; default instance/cache.db so
+# every gunicorn worker sees the same entries), redis://host:6379/0 (several
+# nodes), memory:// (per process). Rate limit buckets use it too unless
+# RATELIMIT_STORAGE_URL says otherwise.
+os.makedirs(app.instance_path, exist_ok=True)
+app.config["CACHE_URL"] = os.environ.get(
+    "CACHE_URL", f"sqlite:///{os.path.join(app.instance_path, 'cache.db')}"
+)
+app.config["CACHE_DEFAULT_TTL"] = 60
+app.config["RATELIMIT_STORAGE_URL"] = os.environ.get("RATELIMIT_STORAGE_URL")
+app.config["RATELIMIT_ENABLED"] = os.environ.get("RATELIMIT_ENABLED", "1") != "0"
 
 db = SQLAlchemy(app)
 bcrypt = Bcrypt(app)
 jwt = JWTManager(app)
+cache = cache_backend.init_app(app)
+limiter = RateLimiter(app)
+# Leaderboards and quiz payloads are invalidated on write; in a per-process
+# cache the other workers would keep serving their stale copy, so don't.
+if not cache.shared:
+    cache = cache_backend.NullCache()
 
 
 # -------------------------------------------------
@@ -136,6 +169,29 @@ class Score(db.Model):
         }
 
 
+class ScoreSubmission(db.Model):
+    """
+    Idempotency keys for POST /api/scores.
+
+    The offline client queues scores and replays them when it's back online,
+    so the same submission can arrive more than once. Kept as its own table
+    so existing databases pick it up via create_all().
+    """
+
+    __tablename__ = "score_submissions"
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "idempotency_key", name="uq_score_submission"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    idempotency_key = db.Column(db.String(64), nullable=False)
+    score_id = db.Column(db.Integer, db.ForeignKey("scores.id"), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    score = db.relationship("Score")
+
+
 # ---------- NEW: user-made quizzes + their questions ----------
 
 class CustomQuiz(db.Model):
@@ -226,11 +282,110 @@ def verify_password(user: User, plain_password: str) -> bool:
     return bcrypt.check_password_hash(user.password_hash, plain_password)
 
 
+# ---------- cache keys ----------
+# Leaderboards are keyed on a version number that every new score bumps, so
+# all nodes drop stale boards at once without scanning keys.
+
+LEADERBOARD_VERSION_KEY = "leaderboard:version"
+
+
+def invalidate_leaderboards():
+    cache.incr(LEADERBOARD_VERSION_KEY)
+
+
+def leaderboard_cache_key(version, category_id, subcategory_id, limit):
+    return f"leaderboard:{version}:{category_id or ''}:{subcategory_id or ''}:{limit}"
+
+
+def quiz_cache_key(quiz_id):
+    return f"quiz:{quiz_id}"
+
+
+def invalidate_quiz(quiz_id):
+    cache.delete(quiz_cache_key(quiz_id))
+
+
+def get_quiz_payload(quiz_id, user_id):
+    """
+    Owner-only quiz dict with its questions, served from the shared cache
+    when hot. Returns None if the quiz doesn't exist or isn't theirs.
+    """
+    key = quiz_cache_key(quiz_id)
+    payload = cache.get(key)
+    if payload is None:
+        quiz = CustomQuiz.query.get(quiz_id)
+        if not quiz:
+            return None
+        payload = {
+            "user_id": quiz.user_id,
+            "quiz": quiz.to_dict(include_questions=True),
+        }
+        cache.set(key, payload, ttl=app.config["CACHE_DEFAULT_TTL"])
+
+    if payload["user_id"] != user_id:
+        return None
+    return payload["quiz"]
+
+
+def parse_score_submission(data, headers):
+    """
+    Validate a POST /api/scores body (shared with the async handlers in
+    asgi.py). Returns (fields, None) or (None, error message).
+    """
+    category_id = data.get("category_id")
+    subcategory_id = data.get("subcategory_id")
+    score_value = data.get("score")
+    total_questions = data.get("total_questions")
+
+    if category_id is None or score_value is None or total_questions is None:
+        return None, "category_id, score and total_questions are required"
+
+    try:
+        score_int = int(score_value)
+        total_int = int(total_questions)
+    except (TypeError, ValueError):
+        return None, "score and total_questions must be integers"
+
+    # Optional: lets clients retry / replay a submission without saving twice
+    idem_key = headers.get("Idempotency-Key") or data.get("idempotency_key") or ""
+    if not isinstance(idem_key, str):
+        return None, "Idempotency key must be a string"
+    idem_key = idem_key.strip()
+    if len(idem_key) > 64:
+        return None, "Idempotency key is too long"
+
+    return {
+        "category_id": category_id,
+        "subcategory_id": subcategory_id,
+        "score": score_int,
+        "total_questions": total_int,
+        "idempotency_key": idem_key,
+    }, None
+
+
+def admin_required(fn):
+    """
+    Like @jwt_required(), but the user must also be listed in
+    ADMIN_USERNAMES.
+    """
+
+    @wraps(fn)
+    @jwt_required()
+    def wrapper(*args, **kwargs):
+        user = User.query.get(int(get_jwt_identity()))
+        if not user or user.username not in app.config["ADMIN_USERNAMES"]:
+            return jsonify({"message": "Admin access required"}), 403
+        return fn(*args, **kwargs)
+
+    return wrapper
+
+
 # -------------------------------------------------
 # Auth routes
 # -------------------------------------------------
 
 @app.route("/api/auth/register", methods=["POST"])
+@limiter.limit("auth")
 def register():
     data = request.get_json() or {}
     username = (data.get("username") or "").strip()
@@ -262,6 +417,7 @@ def register():
 
 
 @app.route("/api/auth/login", methods=["POST"])
+@limiter.limit("auth")
 def login():
     data = request.get_json() or {}
     username = (data.get("username") or "").strip()
@@ -303,8 +459,17 @@ def me():
 
 
 @app.route("/api/debug/users", methods=["GET"])
+@limiter.limit("debug")
 def debug_users():
-    users = User.query.order_by(User.id.asc()).all()
+    try:
+        limit = max(1, min(int(request.args.get("limit", 50)), 200))
+        offset = max(int(request.args.get("offset", 0)), 0)
+    except ValueError:
+        limit, offset = 50, 0
+
+    users = (
+        User.query.order_by(User.id.asc()).offset(offset).limit(limit).all()
+    )
     return jsonify({"users": [u.to_dict_basic() for u in users]})
 
 
@@ -314,41 +479,51 @@ def debug_users():
 
 @app.route("/api/scores", methods=["POST"])
 @jwt_required()
+@limiter.limit("scores")
 def submit_score():
     user_id = int(get_jwt_identity())
-    data = request.get_json() or {}
-    category_id = data.get("category_id")
-    subcategory_id = data.get("subcategory_id")
-    score_value = data.get("score")
-    total_questions = data.get("total_questions")
+    fields, error = parse_score_submission(
+        request.get_json() or {}, request.headers
+    )
+    if error:
+        return jsonify({"message": error}), 400
+    idem_key = fields.pop("idempotency_key")
+
+    if idem_key:
+        existing = ScoreSubmission.query.filter_by(
+            user_id=user_id, idempotency_key=idem_key
+        ).first()
+        if existing:
+            return jsonify(
+                {"message": "Score already saved", "score": existing.score.to_dict()}
+            )
+
+    new_score = Score(user_id=user_id, **fields)
+    db.session.add(new_score)
 
-    if category_id is None or score_value is None or total_questions is None:
-        return (
-            jsonify(
-                {"message": "category_id, score and total_questions are required"}
-            ),
-            400,
+    if idem_key:
+        db.session.flush()
+        db.session.add(
+            ScoreSubmission(
+                user_id=user_id, idempotency_key=idem_key, score_id=new_score.id
+            )
         )
 
     try:
-        score_int = int(score_value)
-        total_int = int(total_questions)
-    except ValueError:
-        return (
-            jsonify({"message": "score and total_questions must be integers"}),
-            400,
+        db.session.commit()
+    except IntegrityError:
+        # same key raced in from another request; that one wins
+        db.session.rollback()
+        existing = ScoreSubmission.query.filter_by(
+            user_id=user_id, idempotency_key=idem_key
+        ).first()
+        if not existing:
+            raise
+        return jsonify(
+            {"message": "Score already saved", "score": existing.score.to_dict()}
         )
 
-    new_score = Score(
-        user_id=user_id,
-        category_id=category_id,
-        subcategory_id=subcategory_id,
-        score=score_int,
-        total_questions=total_int,
-    )
-    db.session.add(new_score)
-    db.session.commit()
-
+    invalidate_leaderboards()
     return jsonify({"message": "Score saved", "score": new_score.to_dict()}), 201
 
 
@@ -362,16 +537,21 @@ def leaderboard():
     except ValueError:
         limit = 10
 
-    query = Score.query
-    if category_id:
-        query = query.filter_by(category_id=category_id)
-    if subcategory_id:
-        query = query.filter_by(subcategory_id=subcategory_id)
+    def load():
+        query = Score.query
+        if category_id:
+            query = query.filter_by(category_id=category_id)
+        if subcategory_id:
+            query = query.filter_by(subcategory_id=subcategory_id)
+
+        query = query.order_by(Score.score.desc(), Score.created_at.asc())
+        return [s.to_dict() for s in query.limit(limit).all()]
 
-    query = query.order_by(Score.score.desc(), Score.created_at.asc())
-    scores = query.limit(limit).all()
+    version = cache.get(LEADERBOARD_VERSION_KEY, 0)
+    key = leaderboard_cache_key(version, category_id, subcategory_id, limit)
+    scores = cache.get_or_set(key, load, ttl=app.config["CACHE_DEFAULT_TTL"])
 
-    return jsonify({"scores": [s.to_dict() for s in scores]})
+    return jsonify({"scores": scores})
 
 
 # -------------------------------------------------
@@ -560,6 +740,7 @@ def create_quiz():
     )
     db.session.add(quiz)
     db.session.commit()
+    invalidate_quiz(quiz.id)
 
     return jsonify({"message": "Quiz created", "quiz": quiz.to_dict()}), 201
 
@@ -571,11 +752,11 @@ def get_my_quiz(quiz_id):
     Get one quiz with its questions (for editing / playing by the owner).
     """
     user_id = int(get_jwt_identity())
-    quiz = CustomQuiz.query.filter_by(id=quiz_id, user_id=user_id).first()
+    quiz = get_quiz_payload(quiz_id, user_id)
     if not quiz:
         return jsonify({"message": "Quiz not found"}), 404
 
-    return jsonify({"quiz": quiz.to_dict(include_questions=True)})
+    return jsonify({"quiz": quiz})
 
 
 @app.route("/api/my/quizzes/<int:quiz_id>", methods=["PUT", "PATCH"])
@@ -599,6 +780,7 @@ def update_quiz(quiz_id):
         quiz.theme = theme.strip() or None
 
     db.session.commit()
+    invalidate_quiz(quiz.id)
     return jsonify({"message": "Quiz updated", "quiz": quiz.to_dict()})
 
 
@@ -612,6 +794,7 @@ def delete_quiz(quiz_id):
 
     db.session.delete(quiz)
     db.session.commit()
+    invalidate_quiz(quiz_id)
     return jsonify({"message": "Quiz deleted"})
 
 
@@ -662,6 +845,7 @@ def add_quiz_question(quiz_id):
     )
     db.session.add(q)
     db.session.commit()
+    invalidate_quiz(quiz.id)
 
     return jsonify({"message": "Quiz question added", "question": q.to_dict()}), 201
 
@@ -704,6 +888,7 @@ def update_quiz_question(quiz_id, question_id):
         q.correct_index = idx
 
     db.session.commit()
+    invalidate_quiz(quiz.id)
     return jsonify({"message": "Quiz question updated", "question": q.to_dict()})
 
 
@@ -724,6 +909,7 @@ def delete_quiz_question(quiz_id, question_id):
 
     db.session.delete(q)
     db.session.commit()
+    invalidate_quiz(quiz.id)
     return jsonify({"message": "Quiz question deleted"})
 
 
@@ -737,11 +923,187 @@ def play_custom_quiz(quiz_id):
     ready for the frontend to run a solo / 2-player game.
     """
     user_id = int(get_jwt_identity())
-    quiz = CustomQuiz.query.filter_by(id=quiz_id, user_id=user_id).first()
+    quiz = get_quiz_payload(quiz_id, user_id)
     if not quiz:
         return jsonify({"message": "Quiz not found"}), 404
 
-    return jsonify({"quiz": quiz.to_dict(include_questions=True)})
+    return jsonify({"quiz": quiz})
+
+
+# -------------------------------------------------
+# Admin: bulk export (CSV / NDJSON)
+# -------------------------------------------------
+
+# Only append-only tables support an incremental `since` cursor. Quizzes and
+# questions get edited and deleted (and SQLite can reuse the top id after a
+# delete), so users and quizzes always need a full export.
+INCREMENTAL_EXPORTS = {"scores"}
+
+
+def _export_sources():
+    """
+    What can be exported. Each entry is (select statement, id column,
+    CSV column order). password_hash is never exported.
+    """
+    return {
+        "users": (
+            db.select(User.id, User.username, User.created_at),
+            User.id,
+            ["id", "username", "created_at"],
+        ),
+        "scores": (
+            db.select(
+                Score.id,
+                Score.user_id,
+                User.username,
+                Score.category_id,
+                Score.subcategory_id,
+                Score.score,
+                Score.total_questions,
+                Score.created_at,
+            ).outerjoin(User, User.id == Score.user_id),
+            Score.id,
+            [
+                "id",
+                "user_id",
+                "username",
+                "category_id",
+                "subcategory_id",
+                "score",
+                "total_questions",
+                "created_at",
+            ],
+        ),
+        # one row per question, with its quiz flattened in
+        "quizzes": (
+            db.select(
+                CustomQuizQuestion.id,
+                CustomQuizQuestion.quiz_id,
+                CustomQuiz.user_id,
+                CustomQuiz.title.label("quiz_title"),
+                CustomQuiz.description.label("quiz_description"),
+                CustomQuiz.theme.label("quiz_theme"),
+                CustomQuizQuestion.question_text,
+                CustomQuizQuestion.option_a,
+                CustomQuizQuestion.option_b,
+                CustomQuizQuestion.option_c,
+                CustomQuizQuestion.option_d,
+                CustomQuizQuestion.correct_index,
+                CustomQuizQuestion.created_at,
+            ).join(CustomQuiz, CustomQuiz.id == CustomQuizQuestion.quiz_id),
+            CustomQuizQuestion.id,
+            [
+                "id",
+                "quiz_id",
+                "user_id",
+                "quiz_title",
+                "quiz_description",
+                "quiz_theme",
+                "question_text",
+                "option_a",
+                "option_b",
+                "option_c",
+                "option_d",
+                "correct_index",
+                "created_at",
+            ],
+        ),
+    }
+
+
+def export_table(table, fmt="ndjson", since=0, gzip=False):
+    """
+    Stream one table. Returns (cursor, chunks) where `cursor` is the value to
+    pass as `since` next time (None for tables that need a full export) and
+    `chunks` is an iterator of bytes.
+    """
+    sources = _export_sources()
+    if table not in sources:
+        raise ValueError(f"Unknown export table: {table}")
+    if fmt not in export.FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    incremental = table in INCREMENTAL_EXPORTS
+    if since and not incremental:
+        raise ValueError(
+            "since is only supported for: " + ", ".join(sorted(INCREMENTAL_EXPORTS))
+        )
+
+    statement, id_column, columns = sources[table]
+    engine = db.engine
+    cursor = export.upper_bound(engine, id_column)
+
+    rows = export.iter_rows(engine, statement, id_column, since=since, until=cursor)
+    text = export.encode(rows, fmt, columns)
+    chunks = export.gzip_chunks(text) if gzip else export.encode_bytes(text)
+    return (max(cursor, since) if incremental else None), chunks
+
+
+@app.route("/api/admin/export/<table>", methods=["GET"])
+@admin_required
+def admin_export(table):
+    """
+    Stream a table for offline analysis.
+
+    Query params:
+      format = csv | ndjson (default ndjson)
+      since  = only rows with id > since (use X-Export-Cursor from last run;
+               scores only, users / quizzes are always exported in full)
+      gzip   = 1 to gzip the body on the fly
+    """
+    fmt = request.args.get("format", "ndjson")
+    use_gzip = request.args.get("gzip") in ("1", "true", "yes")
+    try:
+        since = max(int(request.args.get("since", 0)), 0)
+    except ValueError:
+        return jsonify({"message": "since must be an integer"}), 400
+
+    try:
+        cursor, chunks = export_table(table, fmt, since=since, gzip=use_gzip)
+    except ValueError as exc:
+        return jsonify({"message": str(exc)}), 400
+
+    filename = f"{table}.{fmt}" + (".gz" if use_gzip else "")
+    response = Response(
+        chunks,
+        mimetype="application/gzip" if use_gzip else export.FORMATS[fmt],
+    )
+    response.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    if cursor is not None:
+        response.headers["X-Export-Cursor"] = str(cursor)
+    return response
+
+
+@app.cli.command("export")
+@click.argument("table", type=click.Choice(["users", "scores", "quizzes"]))
+@click.option("--format", "fmt", type=click.Choice(list(export.FORMATS)), default="ndjson")
+@click.option("--since", type=int, default=0,
+              help="Only rows with id > since (scores only).")
+@click.option("--gzip", "use_gzip", is_flag=True, help="Gzip the output.")
+@click.option("-o", "--output", type=click.Path(dir_okay=False), default="-",
+              help="Output file (default: stdout).")
+def export_command(table, fmt, since, use_gzip, output):
+    """
+    Export a table, e.g.
+
+        flask --app app export scores --format csv --gzip -o scores.csv.gz
+
+    For scores the next --since cursor is printed to stderr.
+    """
+    try:
+        cursor, chunks = export_table(table, fmt, since=since, gzip=use_gzip)
+    except ValueError as exc:
+        raise click.UsageError(str(exc))
+    if output == "-":
+        out = sys.stdout.buffer
+        for chunk in chunks:
+            out.write(chunk)
+        out.flush()
+    else:
+        with open(output, "wb") as fh:
+            for chunk in chunks:
+                fh.write(chunk)
+    if cursor is not None:
+        click.echo(f"cursor: {cursor}", err=True)
 
 
 # -------------------------------------------------
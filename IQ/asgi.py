@@ -0,0 +1,436 @@
+"""
+ASGI / async serving mode for the IQ API.
+
+    uvicorn asgi:app --workers 2 --port 5000
+
+The busy endpoints (auth, scores, leaderboard, /api/me, health) are served by
+native async handlers here, on an async SQLAlchemy engine (aiosqlite for the
+default SQLite file). bcrypt and any blocking cache / rate limit backend run
+in a thread pool so a slow client never ties up a worker.
+
+Every other route (custom quizzes, export, static files, ...) falls through
+to the existing Flask app in a thread pool via a2wsgi, so the API surface is
+exactly the same as `gunicorn app:app`.
+
+Each async handler runs inside a Flask request context built from the ASGI
+scope, so JWT checks (verify_jwt_in_request), request.get_json(), error
+handlers and after_request hooks are Flask's own and responses match the
+sync views; tests/test_asgi_parity.py sends the same requests to both.
+"""
+
+import asyncio
+from datetime import datetime
+from functools import partial
+import os
+
+from a2wsgi import WSGIMiddleware
+from flask import g, request
+from flask_jwt_extended import (
+    create_access_token,
+    get_jwt_identity,
+    verify_jwt_in_request,
+)
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import selectinload
+from werkzeug.datastructures import Headers
+from werkzeug.test import EnvironBuilder
+
+import app as wsgi
+from app import (
+    LEADERBOARD_VERSION_KEY,
+    Score,
+    ScoreSubmission,
+    User,
+    bcrypt,
+    cache,
+    leaderboard_cache_key,
+    limiter,
+    parse_score_submission,
+)
+from cache import MemoryCache, NullCache
+from ratelimit import MemoryBucketStore, too_many_requests_body
+
+flask_app = wsgi.app
+
+
+# -------------------------------------------------
+# Async database engine
+# -------------------------------------------------
+
+# sync driver -> async driver for the same database
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+
+
+def async_database_url():
+    """
+    ASYNC_DATABASE_URL if set, otherwise the Flask app's database with the
+    matching async driver (so both modes always point at the same data).
+    """
+    url = os.environ.get("ASYNC_DATABASE_URL")
+    if url:
+        return url
+
+    with flask_app.app_context():
+        # resolved URL: relative SQLite paths point into the instance folder
+        url = wsgi.db.engine.url
+
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        raise RuntimeError(
+            f"No async driver known for {url.get_backend_name()}, "
+            "set ASYNC_DATABASE_URL"
+        )
+    return url.set(drivername=driver).render_as_string(hide_password=False)
+
+
+engine = create_async_engine(async_database_url())
+Session = async_sessionmaker(engine, expire_on_commit=False)
+
+
+# -------------------------------------------------
+# Blocking work -> thread pool
+# -------------------------------------------------
+
+async def run_blocking(fn, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, partial(fn, *args))
+
+
+# The in-process cache / bucket store answer in microseconds, a thread hop
+# would cost more than the call; SQLite-file and Redis backends do real I/O.
+_CACHE_INLINE = isinstance(cache, (MemoryCache, NullCache))
+_LIMITER_INLINE = isinstance(limiter.store, MemoryBucketStore)
+
+
+async def cache_call(fn, *args):
+    if _CACHE_INLINE:
+        return fn(*args)
+    return await run_blocking(fn, *args)
+
+
+# -------------------------------------------------
+# Flask request context for the async handlers
+# -------------------------------------------------
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+def build_environ(scope, body):
+    """WSGI environ for an ASGI request whose body has already been read."""
+    headers = Headers(
+        [(k.decode("latin-1"), v.decode("latin-1")) for k, v in scope.get("headers", [])]
+    )
+    client = scope.get("client")
+    return EnvironBuilder(
+        path=scope.get("root_path", "") + scope["path"],
+        method=scope["method"],
+        headers=headers,
+        data=body,
+        query_string=scope.get("query_string", b"").decode("latin-1"),
+        environ_base={
+            "REMOTE_ADDR": client[0] if client else None,
+            "wsgi.url_scheme": scope.get("scheme", "http"),
+        },
+    ).get_environ()
+
+
+async def send_response(send, response):
+    body = response.get_data()
+    headers = [
+        (name.lower().encode("latin-1"), value.encode("latin-1"))
+        for name, value in response.headers.items()
+    ]
+    await send(
+        {"type": "http.response.start", "status": response.status_code, "headers": headers}
+    )
+    await send({"type": "http.response.body", "body": body})
+    response.close()
+
+
+def jwt_identity():
+    """
+    @jwt_required() for the async handlers: Flask-JWT-Extended's own checks
+    (header config, token type, identity claim, loaders), and any failure is
+    raised so the JWTManager's error handlers build the same 401/422.
+    """
+    verify_jwt_in_request()
+    return get_jwt_identity()
+
+
+async def rate_limited(policy_name, identity=None):
+    """
+    @limiter.limit() for the async handlers: returns the 429 to send, or
+    None. RateLimit-* headers are added by the limiter's after_request hook.
+    """
+    if not flask_app.config["RATELIMIT_ENABLED"]:
+        return None
+
+    ip = limiter.client_ip()
+    if _LIMITER_INLINE:
+        decision = limiter.take_for(policy_name, ip, identity)
+    else:
+        decision = await run_blocking(limiter.take_for, policy_name, ip, identity)
+
+    g._ratelimit = decision
+    if not decision.allowed:
+        return too_many_requests_body(decision), 429
+    return None
+
+
+# -------------------------------------------------
+# Async handlers
+# They run inside a Flask request context and return what the matching view
+# in app.py returns, so `request`, `g`, errors and after_request hooks all
+# behave the same; only the waiting on I/O differs.
+# -------------------------------------------------
+
+async def health():
+    return {"status": "ok", "time": datetime.utcnow().isoformat()}
+
+
+async def register():
+    limited = await rate_limited("auth")
+    if limited:
+        return limited
+
+    data = request.get_json() or {}
+    username = (data.get("username") or "").strip()
+    password = data.get("password") or ""
+
+    if not username or not password:
+        return {"message": "Username and password are required"}, 400
+
+    async with Session() as session:
+        existing = await session.scalar(
+            select(User.id).where(User.username == username)
+        )
+        if existing:
+            return {"message": "Username is already taken"}, 400
+
+        # bcrypt is CPU-bound (and releases the GIL), keep it off the loop
+        pw_hash = await run_blocking(bcrypt.generate_password_hash, password)
+        user = User(username=username, password_hash=pw_hash.decode("utf-8"))
+        session.add(user)
+        try:
+            await session.commit()
+        except IntegrityError:
+            # someone grabbed the name while we were hashing
+            return {"message": "Username is already taken"}, 400
+
+    return (
+        {
+            "message": "User registered",
+            "token": create_access_token(identity=str(user.id)),
+            "user": user.to_dict_basic(),
+        },
+        201,
+    )
+
+
+async def login():
+    limited = await rate_limited("auth")
+    if limited:
+        return limited
+
+    data = request.get_json() or {}
+    username = (data.get("username") or "").strip()
+    password = data.get("password") or ""
+
+    if not username or not password:
+        return {"message": "Username and password are required"}, 400
+
+    async with Session() as session:
+        user = await session.scalar(select(User).where(User.username == username))
+
+    if not user or not await run_blocking(
+        bcrypt.check_password_hash, user.password_hash, password
+    ):
+        return {"message": "Invalid username or password"}, 401
+
+    return {
+        "message": "Logged in",
+        "token": create_access_token(identity=str(user.id)),
+        "user": user.to_dict_basic(),
+    }
+
+
+async def me():
+    user_id = int(jwt_identity())
+
+    async with Session() as session:
+        user = await session.get(User, user_id)
+        if not user:
+            return {"message": "User not found"}, 404
+
+        scores = await session.scalars(
+            select(Score)
+            .options(selectinload(Score.user))
+            .where(Score.user_id == user.id)
+            .order_by(Score.created_at.desc())
+            .limit(20)
+        )
+        return {"user": user.to_dict_basic(), "scores": [s.to_dict() for s in scores]}
+
+
+async def _existing_submission(session, user_id, idem_key):
+    return await session.scalar(
+        select(ScoreSubmission)
+        .options(selectinload(ScoreSubmission.score).selectinload(Score.user))
+        .where(
+            ScoreSubmission.user_id == user_id,
+            ScoreSubmission.idempotency_key == idem_key,
+        )
+    )
+
+
+async def submit_score():
+    identity = jwt_identity()
+    limited = await rate_limited("scores", identity)
+    if limited:
+        return limited
+
+    user_id = int(identity)
+    fields, error = parse_score_submission(request.get_json() or {}, request.headers)
+    if error:
+        return {"message": error}, 400
+    idem_key = fields.pop("idempotency_key")
+
+    async with Session() as session:
+        if idem_key:
+            existing = await _existing_submission(session, user_id, idem_key)
+            if existing:
+                return {"message": "Score already saved", "score": existing.score.to_dict()}
+
+        new_score = Score(user_id=user_id, **fields)
+        session.add(new_score)
+        if idem_key:
+            await session.flush()
+            session.add(
+                ScoreSubmission(
+                    user_id=user_id, idempotency_key=idem_key, score_id=new_score.id
+                )
+            )
+
+        try:
+            await session.commit()
+        except IntegrityError:
+            # same key raced in from another request; that one wins
+            await session.rollback()
+            existing = await _existing_submission(session, user_id, idem_key)
+            if not existing:
+                raise
+            return {"message": "Score already saved", "score": existing.score.to_dict()}
+
+        await session.refresh(new_score, ["user"])
+        payload = new_score.to_dict()
+
+    await cache_call(cache.incr, LEADERBOARD_VERSION_KEY)
+    return {"message": "Score saved", "score": payload}, 201
+
+
+async def leaderboard():
+    jwt_identity()
+    category_id = request.args.get("category_id")
+    subcategory_id = request.args.get("subcategory_id")
+    try:
+        limit = int(request.args.get("limit", 10))
+    except ValueError:
+        limit = 10
+
+    version = await cache_call(cache.get, LEADERBOARD_VERSION_KEY, 0)
+    key = leaderboard_cache_key(version, category_id, subcategory_id, limit)
+    scores = await cache_call(cache.get, key)
+
+    if scores is None:
+        query = select(Score).options(selectinload(Score.user))
+        if category_id:
+            query = query.where(Score.category_id == category_id)
+        if subcategory_id:
+            query = query.where(Score.subcategory_id == subcategory_id)
+        query = query.order_by(Score.score.desc(), Score.created_at.asc()).limit(limit)
+
+        async with Session() as session:
+            scores = [s.to_dict() for s in await session.scalars(query)]
+        await cache_call(cache.set, key, scores, flask_app.config["CACHE_DEFAULT_TTL"])
+
+    return {"scores": scores}
+
+
+ROUTES = {
+    ("GET", "/api/health"): health,
+    ("POST", "/api/auth/register"): register,
+    ("POST", "/api/auth/login"): login,
+    ("GET", "/api/me"): me,
+    ("POST", "/api/scores"): submit_score,
+    ("GET", "/api/leaderboard"): leaderboard,
+}
+
+
+# -------------------------------------------------
+# ASGI app
+# -------------------------------------------------
+
+class AsyncAPI:
+    """
+    Routes ROUTES to the async handlers above (body read up front, then run
+    in a Flask request context) and everything else to the Flask app (in
+    a2wsgi's thread pool, streaming responses included).
+    """
+
+    def __init__(self, routes, fallback):
+        self.routes = routes
+        self.fallback = fallback
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+
+        handler = None
+        if scope["type"] == "http":
+            # exact match: like the Flask rules, "/api/scores/" is not "/api/scores"
+            handler = self.routes.get((scope["method"], scope["path"]))
+        if handler is None:
+            await self.fallback(scope, receive, send)
+            return
+
+        body = await read_body(receive)
+        with flask_app.request_context(build_environ(scope, body)):
+            # same steps as Flask.full_dispatch_request / wsgi_app
+            try:
+                try:
+                    rv = await handler()
+                except Exception as exc:
+                    rv = flask_app.handle_user_exception(exc)
+                response = flask_app.finalize_request(rv)
+            except Exception as exc:
+                response = flask_app.handle_exception(exc)
+            await send_response(send, response)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await engine.dispose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+app = AsyncAPI(
+    ROUTES,
+    WSGIMiddleware(flask_app, workers=int(os.environ.get("ASGI_WSGI_THREADS", 10))),
+)
@@ -0,0 +1,339 @@
+"""
+Compare the sync (gunicorn, sync workers) and async (uvicorn + asgi.py)
+deployments under concurrent connections.
+
+    python bench_serving.py
+    python bench_serving.py --workers 2 --concurrency 10 50 200 --duration 10
+
+Both servers are started here against a throwaway SQLite database (rate
+limiting off). Every request opens a fresh connection, like a browser behind
+a proxy that doesn't keep-alive to gunicorn. Scenarios:
+
+  leaderboard   GET  /api/leaderboard  (JWT + cached query), N clients
+  login         POST /api/auth/login   (bcrypt), N clients
+  slow-uploads  mixed load: --slow-clients connections each trickle a
+                request body over --slow-hold seconds (a phone on bad 3G
+                posting a score), reconnecting as soon as they finish, while
+                --fast-clients clients hit the leaderboard. Reports the fast
+                requests' latency, i.e. what everyone else sees while the
+                slow uploads are in flight.
+
+The slow connections are held open past accept: the server has parsed the
+headers and is waiting on the body. A sync worker is stuck on each of them,
+so once there are more slow uploads than workers the fast requests queue
+behind them. The async server keeps waiting on the body without tying up
+anything, so fast latency should stay flat.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+BENCH_USER = {"username": "bench-user", "password": "bench-password"}
+
+
+# -------------------------------------------------
+# Servers
+# -------------------------------------------------
+
+def server_commands(workers, port):
+    return {
+        "sync (gunicorn)": [
+            sys.executable, "-m", "gunicorn",
+            "-w", str(workers), "-k", "sync",
+            "-b", f"127.0.0.1:{port}",
+            "app:app",
+        ],
+        "async (uvicorn)": [
+            sys.executable, "-m", "uvicorn",
+            "--workers", str(workers),
+            "--host", "127.0.0.1", "--port", str(port),
+            "--log-level", "warning",
+            "asgi:app",
+        ],
+    }
+
+
+def wait_until_up(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/api/health", timeout=1)
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server on port {port} did not come up")
+
+
+def api(port, method, path, body=None, token=None):
+    headers = {"Content-Type": "application/json"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    req = urllib.request.Request(
+        f"http://127.0.0.1:{port}{path}",
+        data=json.dumps(body).encode() if body is not None else None,
+        headers=headers,
+        method=method,
+    )
+    try:
+        with urllib.request.urlopen(req) as res:
+            return json.loads(res.read())
+    except urllib.error.HTTPError as exc:
+        return json.loads(exc.read())
+
+
+def seed(port):
+    """Bench user + a few scores; returns a JWT."""
+    data = api(port, "POST", "/api/auth/register", BENCH_USER)
+    if "token" not in data:
+        data = api(port, "POST", "/api/auth/login", BENCH_USER)
+    token = data["token"]
+    for i in range(20):
+        api(port, "POST", "/api/scores",
+            {"category_id": "gk", "score": i % 11, "total_questions": 10}, token)
+    return token
+
+
+# -------------------------------------------------
+# Load generator
+# -------------------------------------------------
+
+def build_request(method, path, port, token=None, body=None):
+    lines = [f"{method} {path} HTTP/1.1", f"Host: 127.0.0.1:{port}", "Connection: close"]
+    if token:
+        lines.append(f"Authorization: Bearer {token}")
+    payload = b""
+    if body is not None:
+        payload = json.dumps(body).encode()
+        lines.append("Content-Type: application/json")
+        lines.append(f"Content-Length: {len(payload)}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode() + payload
+
+
+async def one_request(port, raw):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        writer.write(raw)
+        await writer.drain()
+
+        status_line = await reader.readline()
+        await reader.read()  # Connection: close -> read to EOF
+        return int(status_line.split()[1])
+    finally:
+        writer.close()
+
+
+def slow_upload_request(port, size):
+    """
+    Headers for a POST whose `size`-byte body will arrive slowly, plus the
+    body. Login with an empty username is rejected before bcrypt or the
+    database, so the only cost on the server is waiting for the body.
+    """
+    body = b'{"username": ""' + b" " * max(0, size - 17) + b"}"
+    head = (
+        "POST /api/auth/login HTTP/1.1\r\n"
+        f"Host: 127.0.0.1:{port}\r\n"
+        "Connection: close\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n"
+    ).encode()
+    return head, body
+
+
+async def slow_upload(port, head, body, hold, pieces=10):
+    """Send the headers at once, then the body in `pieces` over `hold` s."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        writer.write(head)
+        await writer.drain()
+        step = -(-len(body) // pieces)
+        for i in range(0, len(body), step):
+            await asyncio.sleep(hold / pieces)
+            writer.write(body[i:i + step])
+            await writer.drain()
+        await reader.read()
+    finally:
+        writer.close()
+
+
+def summarise(latencies, errors, elapsed):
+    latencies.sort()
+
+    def pct(p):
+        if not latencies:
+            return float("nan")
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50": pct(0.50),
+        "p99": pct(0.99),
+        "mean": statistics.fmean(latencies) * 1000 if latencies else float("nan"),
+        "errors": errors,
+    }
+
+
+async def run_load(port, raw, concurrency, duration, timeout=10.0):
+    """`concurrency` clients sending `raw` back to back for `duration` s."""
+    latencies = []
+    errors = 0
+    stop_at = time.perf_counter() + duration
+
+    async def client():
+        nonlocal errors
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            try:
+                status = await asyncio.wait_for(one_request(port, raw), timeout)
+            except (OSError, asyncio.TimeoutError):
+                status = None
+            if status is None or status >= 400:
+                errors += 1
+            else:
+                latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return summarise(latencies, errors, time.perf_counter() - started)
+
+
+async def run_mixed(port, raw, fast_clients, slow_clients, duration, hold,
+                    upload_size=2048):
+    """
+    Fast-request stats from run_load() while `slow_clients` slow uploads
+    are kept in flight for the whole run.
+    """
+    head, body = slow_upload_request(port, upload_size)
+    stop = asyncio.Event()
+    uploads = 0
+
+    async def uploader():
+        nonlocal uploads
+        while not stop.is_set():
+            try:
+                await slow_upload(port, head, body, hold)
+                uploads += 1
+            except OSError:
+                await asyncio.sleep(0.1)
+
+    slow = [asyncio.create_task(uploader()) for _ in range(slow_clients)]
+    # let the slow connections get accepted and start their bodies first
+    await asyncio.sleep(min(1.0, hold / 2))
+    stats = await run_load(port, raw, fast_clients, duration)
+
+    stop.set()
+    for task in slow:
+        task.cancel()
+    await asyncio.gather(*slow, return_exceptions=True)
+    stats["uploads"] = uploads
+    return stats
+
+
+# -------------------------------------------------
+# Main
+# -------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per run")
+    parser.add_argument(
+        "--slow-clients", type=int, nargs="+", default=[0, 8, 64],
+        help="slow uploads held open during slow-uploads runs",
+    )
+    parser.add_argument("--fast-clients", type=int, default=10)
+    parser.add_argument(
+        "--slow-hold", type=float, default=10.0,
+        help="seconds each slow upload takes to send its body",
+    )
+    parser.add_argument("--port", type=int, default=5077)
+    parser.add_argument(
+        "--scenarios", nargs="+",
+        default=["leaderboard", "login", "slow-uploads"],
+        choices=["leaderboard", "login", "slow-uploads"],
+    )
+    args = parser.parse_args()
+
+    def levels(scenario):
+        return args.slow_clients if scenario == "slow-uploads" else args.concurrency
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+            CACHE_URL=f"sqlite:///{os.path.join(tmp, 'cache.db')}",
+            RATELIMIT_ENABLED="0",
+        )
+
+        for name, cmd in server_commands(args.workers, args.port).items():
+            proc = subprocess.Popen(
+                cmd, cwd=HERE, env=env,
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                start_new_session=True,
+            )
+            try:
+                wait_until_up(args.port)
+                token = seed(args.port)
+                board = build_request("GET", "/api/leaderboard?category_id=gk",
+                                      args.port, token)
+                login = build_request("POST", "/api/auth/login", args.port,
+                                      body=BENCH_USER)
+
+                for scenario in args.scenarios:
+                    for level in levels(scenario):
+                        if scenario == "slow-uploads":
+                            stats = asyncio.run(run_mixed(
+                                args.port, board, args.fast_clients, level,
+                                args.duration, args.slow_hold,
+                            ))
+                            label = f"slow={level:<4}"
+                        else:
+                            raw = board if scenario == "leaderboard" else login
+                            stats = asyncio.run(
+                                run_load(args.port, raw, level, args.duration)
+                            )
+                            label = f"c={level:<6}"
+                        results[(name, scenario, level)] = stats
+                        print(
+                            f"{name:16} {scenario:12} {label} "
+                            f"{stats['rps']:8.1f} req/s  p50 {stats['p50']:7.1f} ms  "
+                            f"p99 {stats['p99']:7.1f} ms  errors {stats['errors']}",
+                            flush=True,
+                        )
+            finally:
+                os.killpg(proc.pid, signal.SIGTERM)
+                proc.wait(timeout=15)
+                time.sleep(0.5)  # let the port free up
+
+    sync_name, async_name = server_commands(args.workers, args.port)
+    print()
+    print(f"{'scenario':12} {'level':>5} {'sync req/s':>11} {'async req/s':>12} "
+          f"{'sync p99':>10} {'async p99':>10} {'errors s/a':>11}")
+    for scenario in args.scenarios:
+        for level in levels(scenario):
+            sync = results[(sync_name, scenario, level)]
+            asyn = results[(async_name, scenario, level)]
+            print(
+                f"{scenario:12} {level:>5} {sync['rps']:>11.1f} {asyn['rps']:>12.1f} "
+                f"{sync['p99']:>8.1f}ms {asyn['p99']:>8.1f}ms "
+                f"{sync['errors']:>5}/{asyn['errors']:<5}"
+            )
+    print()
+    print("slow-uploads: level = slow uploads in flight; req/s, p99 and errors are")
+    print(f"for the {args.fast_clients} fast leaderboard clients running alongside.")
+
+
+if __name__ == "__main__":
+    main()
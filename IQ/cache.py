@@ -0,0 +1,351 @@
+"""
+Shared cache / state backend for the IQ API.
+
+One small interface (get / set / delete / incr / get_or_set) with three
+backends, picked by CACHE_URL:
+
+  memory://                  -- per process, for `python app.py` / one worker
+  sqlite:////path/cache.db   -- a SQLite file shared by workers on one box
+                                (app.py defaults to instance/cache.db)
+  redis://host:6379/0        -- any Redis-protocol server, for several nodes
+
+Values are stored as JSON so every backend (and every node) sees the same
+thing. Each backend also hands out a matching token bucket store for the
+rate limiter, so rate limits are shared the same way.
+
+A backend's `shared` flag says whether every worker sees the same data.
+Anything invalidated on write (leaderboards, quiz payloads) must only be
+cached in a shared one; with memory:// app.py uses NullCache for those.
+"""
+
+from collections import OrderedDict
+import json
+import sqlite3
+import threading
+import time
+
+import ratelimit
+
+
+class BaseCache:
+    """Common helpers; backends implement the raw get/set/delete/incr."""
+
+    shared = True  # every worker / node sees the same entries
+
+    def get(self, key, default=None):
+        raw = self._get(key)
+        if raw is None:
+            return default
+        return json.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        self._set(key, json.dumps(value), ttl)
+
+    def get_or_set(self, key, fn, ttl=None):
+        """Return the cached value, or call fn(), cache and return it."""
+        raw = self._get(key)
+        if raw is not None:
+            return json.loads(raw)
+        value = fn()
+        self._set(key, json.dumps(value), ttl)
+        return value
+
+    def delete(self, *keys):
+        raise NotImplementedError
+
+    def incr(self, key, amount=1):
+        """Atomically add `amount` to an integer key (missing = 0)."""
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def bucket_store(self):
+        """Token bucket store for ratelimit.RateLimiter on this backend."""
+        raise NotImplementedError
+
+
+# -------------------------------------------------
+# In-process
+# -------------------------------------------------
+
+class MemoryCache(BaseCache):
+    """
+    Per-process dict. Fine for `python app.py` or a single worker; with
+    several workers each one has its own copy (and its own rate limits).
+
+    Capped at `max_keys` entries (least recently used dropped first), and
+    expired entries are swept every SWEEP_EVERY writes, so keys nobody reads
+    again (old leaderboard versions, one-off query params) don't pile up.
+    Counters from incr() are kept apart and never evicted: dropping a
+    version key would restart it at 0 and bring old versioned keys back.
+    """
+
+    shared = False
+    SWEEP_EVERY = 500  # writes between sweeps of expired entries
+
+    def __init__(self, max_keys=10_000, clock=time.monotonic):
+        self.max_keys = max_keys
+        self._clock = clock
+        self._data = OrderedDict()  # key -> (raw, expires_at or None)
+        self._counters = {}  # incr() keys -> int, outside the LRU
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._buckets = None
+
+    def _get(self, key):
+        with self._lock:
+            if key in self._counters:
+                return json.dumps(self._counters[key])
+            item = self._data.get(key)
+            if item is None:
+                return None
+            raw, expires_at = item
+            if expires_at is not None and expires_at <= self._clock():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return raw
+
+    def _set(self, key, raw, ttl):
+        with self._lock:
+            self._counters.pop(key, None)
+            now = self._clock()
+            self._data[key] = (raw, now + ttl if ttl else None)
+            self._data.move_to_end(key)
+
+            self._writes += 1
+            if self._writes % self.SWEEP_EVERY == 0:
+                expired = [
+                    k for k, (_, exp) in self._data.items()
+                    if exp is not None and exp <= now
+                ]
+                for k in expired:
+                    del self._data[k]
+
+            while len(self._data) > self.max_keys:
+                self._data.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+                self._counters.pop(key, None)
+
+    def incr(self, key, amount=1):
+        with self._lock:
+            if key not in self._counters:
+                # a plain set() value becomes a counter
+                item = self._data.pop(key, None)
+                current = 0
+                if item is not None and (item[1] is None or item[1] > self._clock()):
+                    current = int(json.loads(item[0]))
+                self._counters[key] = current
+            self._counters[key] += amount
+            return self._counters[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._counters.clear()
+        if self._buckets is not None:
+            self._buckets.reset()
+
+    def __len__(self):
+        return len(self._data) + len(self._counters)
+
+    def bucket_store(self):
+        if self._buckets is None:
+            self._buckets = ratelimit.MemoryBucketStore()
+        return self._buckets
+
+
+class NullCache(BaseCache):
+    """
+    Caches nothing: every read misses and recomputes. Stands in for
+    MemoryCache on data other workers can change, so reads stay fresh.
+    """
+
+    def _get(self, key):
+        return None
+
+    def _set(self, key, raw, ttl):
+        pass
+
+    def delete(self, *keys):
+        pass
+
+    def incr(self, key, amount=1):
+        return amount
+
+    def clear(self):
+        pass
+
+
+# -------------------------------------------------
+# SQLite file
+# -------------------------------------------------
+
+class SqliteCache(BaseCache):
+    """
+    Cache table in a standalone SQLite file (WAL mode), shared by every
+    worker process on the same machine. Expired rows are skipped on read
+    and swept on write every so often.
+    """
+
+    SWEEP_EVERY = 500  # writes between sweeps of expired rows
+
+    def __init__(self, path, clock=time.time):
+        self.path = path
+        self._clock = clock
+        self._local = threading.local()
+        self._writes = 0
+
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL)"
+        )
+
+    def _conn(self):
+        # sqlite3 connections can't be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _get(self, key):
+        row = self._conn().execute(
+            "SELECT value FROM cache"
+            " WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, self._clock()),
+        ).fetchone()
+        return row[0] if row else None
+
+    def _set(self, key, raw, ttl):
+        now = self._clock()
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, raw, now + ttl if ttl else None),
+        )
+        self._writes += 1
+        if self._writes % self.SWEEP_EVERY == 0:
+            conn.execute(
+                "DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at <= ?",
+                (now,),
+            )
+
+    def delete(self, *keys):
+        if keys:
+            self._conn().executemany(
+                "DELETE FROM cache WHERE key = ?", [(k,) for k in keys]
+            )
+
+    def incr(self, key, amount=1):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            raw = self._get(key)
+            value = int(json.loads(raw or "0")) + amount
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at)"
+                " VALUES (?, ?, NULL)",
+                (key, json.dumps(value)),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return value
+
+    def clear(self):
+        self._conn().execute("DELETE FROM cache")
+        self.bucket_store().reset()
+
+    def bucket_store(self):
+        return ratelimit.SqliteBucketStore(self._conn)
+
+
+# -------------------------------------------------
+# Redis protocol
+# -------------------------------------------------
+
+class RedisCache(BaseCache):
+    """
+    Any Redis-protocol server. `client` is a redis-py style client (e.g.
+    redis.Redis or fakeredis.FakeRedis); every key gets `prefix`.
+    """
+
+    def __init__(self, client, prefix="iq:"):
+        self.client = client
+        self.prefix = prefix
+
+    def _get(self, key):
+        raw = self.client.get(self.prefix + key)
+        if isinstance(raw, bytes):
+            raw = raw.decode("utf-8")
+        return raw
+
+    def _set(self, key, raw, ttl):
+        if ttl:
+            self.client.set(self.prefix + key, raw, px=int(ttl * 1000))
+        else:
+            self.client.set(self.prefix + key, raw)
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*[self.prefix + k for k in keys])
+
+    def incr(self, key, amount=1):
+        return int(self.client.incrby(self.prefix + key, amount))
+
+    def clear(self):
+        for key in self.client.scan_iter(match=self.prefix + "*"):
+            self.client.delete(key)
+
+    def bucket_store(self):
+        return ratelimit.RedisBucketStore(self.client, prefix=self.prefix + "rl:")
+
+
+# -------------------------------------------------
+# Factory / Flask glue
+# -------------------------------------------------
+
+def cache_from_url(url, max_keys=10_000):
+    """`max_keys` caps the in-process backend; shared backends ignore it."""
+    if not url or url.startswith("memory://"):
+        return MemoryCache(max_keys=max_keys)
+
+    if url.startswith("sqlite:///"):
+        return SqliteCache(url[len("sqlite:///"):])
+
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        try:
+            import redis
+        except ImportError as exc:
+            raise RuntimeError(
+                "CACHE_URL points at Redis but the 'redis' package is not installed"
+            ) from exc
+        return RedisCache(redis.Redis.from_url(url))
+
+    raise ValueError(f"Unsupported CACHE_URL: {url}")
+
+
+def init_app(app, backend=None):
+    """
+    Attach a cache to the app (app.extensions["cache"]) and return it.
+    Pass `backend` to use an existing instance, e.g. in tests.
+    """
+    app.config.setdefault("CACHE_URL", "memory://")
+    app.config.setdefault("CACHE_MAX_KEYS", 10_000)
+    cache = backend or cache_from_url(
+        app.config["CACHE_URL"], max_keys=app.config["CACHE_MAX_KEYS"]
+    )
+    app.extensions["cache"] = cache
+    return cache
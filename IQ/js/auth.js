@@ -231,6 +231,9 @@
       clearInputs();
       updateAuthUI();
       setMessage("Logged in.", "success");
+
+      // scores queued under an expired token can go through now
+      if (window.offlineScores) window.offlineScores.flushQueuedScores();
     } catch (err) {
       setMessage(err.message, "error");
     }
@@ -0,0 +1,148 @@
+// js/offline-queue.js
+// IndexedDB queue for score submissions made while offline.
+// Loaded by the page (index.html) AND by the service worker (importScripts),
+// so it must not touch window / document / localStorage.
+
+(function () {
+  const DB_NAME = "iq-offline";
+  const DB_VERSION = 1;
+  const STORE = "pending-scores";
+
+  // Background Sync tag used by sw.js
+  const SYNC_TAG = "iq-score-queue";
+
+  let dbPromise = null;
+
+  function openDb() {
+    if (dbPromise) return dbPromise;
+
+    dbPromise = new Promise((resolve, reject) => {
+      const req = indexedDB.open(DB_NAME, DB_VERSION);
+      req.onupgradeneeded = () => {
+        // keyPath = idempotency key, so queueing the same score twice is a no-op
+        req.result.createObjectStore(STORE, { keyPath: "key" });
+      };
+      req.onsuccess = () => resolve(req.result);
+      req.onerror = () => {
+        dbPromise = null;
+        reject(req.error);
+      };
+    });
+    return dbPromise;
+  }
+
+  function withStore(mode, fn) {
+    return openDb().then(
+      (db) =>
+        new Promise((resolve, reject) => {
+          const tx = db.transaction(STORE, mode);
+          const result = fn(tx.objectStore(STORE));
+          tx.oncomplete = () => resolve(result && result.result);
+          tx.onerror = () => reject(tx.error);
+          tx.onabort = () => reject(tx.error);
+        })
+    );
+  }
+
+  // entry: { key, userId, url, headers, body, queuedAt }
+  function add(entry) {
+    return withStore("readwrite", (store) =>
+      store.put({ queuedAt: Date.now(), ...entry })
+    );
+  }
+
+  function all() {
+    return withStore("readonly", (store) => store.getAll()).then(
+      (items) => (items || []).sort((a, b) => a.queuedAt - b.queuedAt)
+    );
+  }
+
+  function remove(key) {
+    return withStore("readwrite", (store) => store.delete(key));
+  }
+
+  function count() {
+    return withStore("readonly", (store) => store.count());
+  }
+
+  // Idempotency key for one score submission
+  function newKey() {
+    if (self.crypto && typeof self.crypto.randomUUID === "function") {
+      return self.crypto.randomUUID();
+    }
+    return (
+      Date.now().toString(36) + "-" + Math.random().toString(36).slice(2, 12)
+    );
+  }
+
+  let replaying = null;
+
+  // Send every queued score, oldest first.
+  // getHeaders(item) (optional) returns fresh auth headers for an item – the
+  // page passes its current token if it belongs to the same user; the
+  // service worker falls back to the headers stored when the score was
+  // queued.
+  // Resolves to { sent, remaining }.
+  function replay(getHeaders) {
+    // don't let the page and an "online" event replay the same items twice
+    if (replaying) return replaying;
+
+    replaying = (async () => {
+      let sent = 0;
+      const items = await all();
+
+      for (const item of items) {
+        const headers = {
+          ...item.headers,
+          ...(getHeaders ? getHeaders(item) : {}),
+          "Content-Type": "application/json",
+          "Idempotency-Key": item.key,
+        };
+
+        let res;
+        try {
+          res = await fetch(item.url, {
+            method: "POST",
+            headers,
+            body: JSON.stringify(item.body),
+          });
+        } catch (err) {
+          // still offline – try again later
+          break;
+        }
+
+        if (res.ok) {
+          await remove(item.key);
+          sent += 1;
+          continue;
+        }
+
+        // 401: token expired, keep it until the user logs in again
+        // 429 / 5xx: server busy, retry later
+        if (res.status === 401 || res.status === 429 || res.status >= 500) {
+          break;
+        }
+
+        // any other 4xx will never succeed, drop it
+        console.warn("Dropping queued score, server said", res.status);
+        await remove(item.key);
+      }
+
+      return { sent, remaining: await count() };
+    })().finally(() => {
+      replaying = null;
+    });
+
+    return replaying;
+  }
+
+  self.iqScoreQueue = {
+    SYNC_TAG,
+    add,
+    all,
+    remove,
+    count,
+    newKey,
+    replay,
+  };
+})();
@@ -0,0 +1,81 @@
+// js/offline.js
+// Registers the service worker and flushes scores queued while offline.
+
+(function () {
+  const API_BASE_URL = window.API_BASE_URL || "http://127.0.0.1:5000/api";
+
+  function currentUser() {
+    return window.authService &&
+      typeof window.authService.getUser === "function"
+      ? window.authService.getUser()
+      : null;
+  }
+
+  function currentAuthHeaders() {
+    return window.authService &&
+      typeof window.authService.getAuthHeaders === "function"
+      ? window.authService.getAuthHeaders()
+      : {};
+  }
+
+  // Only swap in the current token if it's the same user who played,
+  // so a queued score is never credited to somebody else.
+  function authHeadersFor(item) {
+    const user = currentUser();
+    if (user && item.userId != null && user.id === item.userId) {
+      return currentAuthHeaders();
+    }
+    return {};
+  }
+
+  // Queue a score for later. Asks the service worker for a Background Sync
+  // where supported; otherwise the "online" listener below picks it up.
+  async function queueScore(key, body) {
+    await window.iqScoreQueue.add({
+      key,
+      userId: currentUser() ? currentUser().id : null,
+      url: `${API_BASE_URL}/scores`,
+      headers: currentAuthHeaders(),
+      body,
+    });
+
+    if ("serviceWorker" in navigator && "SyncManager" in window) {
+      try {
+        const reg = await navigator.serviceWorker.ready;
+        await reg.sync.register(window.iqScoreQueue.SYNC_TAG);
+      } catch (err) {
+        console.warn("Background sync unavailable:", err);
+      }
+    }
+  }
+
+  async function flushQueuedScores() {
+    if (!window.iqScoreQueue || !navigator.onLine) return;
+    try {
+      const { sent, remaining } = await window.iqScoreQueue.replay(
+        authHeadersFor
+      );
+      if (sent) {
+        console.log(`Saved ${sent} queued score(s), ${remaining} left.`);
+      }
+    } catch (err) {
+      console.error("Error replaying queued scores:", err);
+    }
+  }
+
+  if ("serviceWorker" in navigator) {
+    window.addEventListener("load", () => {
+      navigator.serviceWorker
+        .register("sw.js")
+        .catch((err) => console.warn("Service worker failed:", err));
+    });
+  }
+
+  window.addEventListener("online", flushQueuedScores);
+  window.addEventListener("load", flushQueuedScores);
+
+  window.offlineScores = {
+    queueScore,
+    flushQueuedScores,
+  };
+})();
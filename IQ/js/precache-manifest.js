@@ -0,0 +1,39 @@
+// js/precache-manifest.js
+// Files the service worker (sw.js) caches on install.
+// Shell files and question banks are served stale-while-revalidate, so a
+// deploy reaches clients on their next load even if nobody touches this file.
+// Bump IQ_CACHE_VERSION to throw away old caches outright (e.g. when files are
+// renamed or removed).
+
+self.IQ_CACHE_VERSION = "v1";
+
+// App shell: everything index.html needs to boot
+self.IQ_PRECACHE_STATIC = [
+  "./",
+  "index.html",
+  "css/home.css",
+  "css/quiz.css",
+  "css/theme.css",
+  "js/data.js",
+  "js/core.js",
+  "js/auth.js",
+  "js/home.js",
+  "js/quiz.js",
+  "js/leaderboard.js",
+  "js/my-quizzes.js",
+  "js/custom-quiz.js",
+  "js/events.js",
+  "js/offline-queue.js",
+  "js/offline.js"
+];
+
+// Local question banks (keep in sync with jsonPath entries in js/data.js)
+self.IQ_PRECACHE_QUESTIONS = [
+  "data/questions-gk-geography.json",
+  "data/questions-gk-history.json",
+  "data/questions-science-physics.json",
+  "data/questions-science-biology.json",
+  "data/questions-sports-football.json",
+  "data/questions-sports-cricket.json",
+  "data/questions-sports-basketball.json"
+];
@@ -19,6 +19,10 @@ document.addEventListener("DOMContentLoaded", () => {
 
   let quizEnded = false;
   let timerId = null;
+
+  // Idempotency key for saving this result (one per finished quiz, so
+  // double clicks / offline replays never save the score twice)
+  let scoreSubmissionKey = null;
   let secondsRemaining = 0;
 
   let currentGroup = null;
@@ -435,6 +439,7 @@ document.addEventListener("DOMContentLoaded", () => {
   function endQuiz(source) {
     if (quizEnded) return;
     quizEnded = true;
+    scoreSubmissionKey = null;
 
     if (timerId) {
       clearInterval(timerId);
@@ -566,6 +571,24 @@ document.addEventListener("DOMContentLoaded", () => {
     statusEl.classList.remove("status-error");
     statusEl.classList.remove("status-success");
 
+    if (!scoreSubmissionKey) {
+      scoreSubmissionKey = window.iqScoreQueue
+        ? window.iqScoreQueue.newKey()
+        : String(Date.now());
+    }
+    const payload = {
+      category_id: categoryId,
+      subcategory_id: subcategoryId,
+      score: scoreValue,
+      total_questions: totalQuestions,
+    };
+
+    // Offline: queue it, the service worker / offline.js sends it later
+    if (!navigator.onLine && window.offlineScores) {
+      await queueOfflineScore(statusEl, payload);
+      return;
+    }
+
     // 5) POST to /api/scores with JWT from authService
     try {
       const headers =
@@ -578,14 +601,10 @@ document.addEventListener("DOMContentLoaded", () => {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
+          "Idempotency-Key": scoreSubmissionKey,
           ...headers,
         },
-        body: JSON.stringify({
-          category_id: categoryId,
-          subcategory_id: subcategoryId,
-          score: scoreValue,
-          total_questions: totalQuestions,
-        }),
+        body: JSON.stringify(payload),
       });
 
       if (!res.ok) {
@@ -609,6 +628,25 @@ document.addEventListener("DOMContentLoaded", () => {
       statusEl.classList.add("status-success");
     } catch (err) {
       console.error("Error saving score:", err);
+      if (window.offlineScores) {
+        await queueOfflineScore(statusEl, payload);
+        return;
+      }
+      statusEl.textContent = "Network error saving score.";
+      statusEl.classList.remove("status-success");
+      statusEl.classList.add("status-error");
+    }
+  }
+
+  async function queueOfflineScore(statusEl, payload) {
+    try {
+      await window.offlineScores.queueScore(scoreSubmissionKey, payload);
+      statusEl.textContent =
+        "You're offline – score queued, it will be saved when you reconnect.";
+      statusEl.classList.remove("status-error");
+      statusEl.classList.add("status-success");
+    } catch (err) {
+      console.error("Error queueing score:", err);
       statusEl.textContent = "Network error saving score.";
       statusEl.classList.remove("status-success");
       statusEl.classList.add("status-error");
@@ -0,0 +1,445 @@
+"""
+Rate limiting for the IQ API.
+
+Token buckets keyed per client IP or per logged-in user. Each route gets a
+named policy (capacity + refill rate), and the check itself is a dict lookup
+and a bit of float maths, so it stays in the microsecond range.
+
+Buckets follow the app's cache backend (see cache.py), so they are shared by
+every worker using the same SQLite file or Redis server; an in-process store
+only limits its own worker. RATELIMIT_STORAGE_URL can point them at a
+Redis-protocol server directly (or hand in any client with an `eval` method,
+e.g. fakeredis, via `RedisBucketStore(client)`).
+"""
+
+from collections import OrderedDict
+from functools import wraps
+import math
+import threading
+import time
+
+from flask import current_app, g, jsonify, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+
+
+# -------------------------------------------------
+# Policies
+# -------------------------------------------------
+
+class Policy:
+    """
+    A token bucket policy: `capacity` requests in a burst, refilled at
+    `capacity / period` tokens per second.
+
+    scope is "ip" (client address) or "user" (JWT identity, falling back
+    to the IP for anonymous requests).
+    """
+
+    __slots__ = ("name", "capacity", "period", "scope", "rate")
+
+    def __init__(self, name, capacity, period, scope="ip"):
+        if capacity <= 0 or period <= 0:
+            raise ValueError("capacity and period must be positive")
+        if scope not in ("ip", "user"):
+            raise ValueError("scope must be 'ip' or 'user'")
+        self.name = name
+        self.capacity = int(capacity)
+        self.period = float(period)
+        self.scope = scope
+        self.rate = self.capacity / self.period
+
+
+# Sensible defaults, overridable through app.config["RATELIMIT_POLICIES"].
+# Capacities are per bucket store: with an in-process store (memory://) each
+# of N workers has its own buckets, so "auth" allows N x 10 logins a minute
+# per IP. app.py defaults to a SQLite cache file so workers share them.
+DEFAULT_POLICIES = {
+    # bcrypt is expensive, keep auth tight
+    "auth": {"capacity": 10, "period": 60, "scope": "ip"},
+    "scores": {"capacity": 30, "period": 60, "scope": "user"},
+    "debug": {"capacity": 5, "period": 60, "scope": "ip"},
+}
+
+
+# -------------------------------------------------
+# Stores
+# -------------------------------------------------
+
+class Decision:
+    """Result of one bucket check."""
+
+    __slots__ = ("allowed", "limit", "remaining", "reset_after", "retry_after")
+
+    def __init__(self, allowed, limit, remaining, reset_after, retry_after):
+        self.allowed = allowed
+        self.limit = limit
+        self.remaining = remaining
+        self.reset_after = reset_after  # seconds until the bucket is full
+        self.retry_after = retry_after  # seconds until one token is available
+
+
+def _refill(tokens, last, now, policy):
+    elapsed = now - last
+    if elapsed > 0:
+        tokens = min(policy.capacity, tokens + elapsed * policy.rate)
+    return tokens
+
+
+def _decide(tokens, policy, cost):
+    """Shared maths once we know how many tokens are in the bucket."""
+    allowed = tokens >= cost
+    if allowed:
+        tokens -= cost
+        retry_after = 0.0
+    else:
+        retry_after = (cost - tokens) / policy.rate
+    reset_after = (policy.capacity - tokens) / policy.rate
+    return tokens, Decision(
+        allowed,
+        policy.capacity,
+        int(tokens),
+        reset_after,
+        retry_after,
+    )
+
+
+class MemoryBucketStore:
+    """
+    In-process token buckets.
+
+    Each key maps to a two-item list [tokens, last_refill] and the dict is
+    capped at `max_keys` entries (least recently used keys are dropped first),
+    so a flood of spoofed addresses can't grow memory without bound. A
+    dropped key just starts over with a full bucket.
+    """
+
+    def __init__(self, max_keys=100_000, clock=time.monotonic):
+        self.max_keys = max_keys
+        self._clock = clock
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, policy, cost=1):
+        now = self._clock()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = [float(policy.capacity), now]
+                self._buckets[key] = bucket
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = _refill(bucket[0], bucket[1], now, policy)
+                bucket[1] = now
+
+            bucket[0], decision = _decide(bucket[0], policy, cost)
+            return decision
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class SqliteBucketStore:
+    """
+    Token buckets in a SQLite file, shared by every worker on one machine.
+
+    `connect` returns an autocommit sqlite3 connection for the current
+    thread (see cache.SqliteCache). Each take is a short BEGIN IMMEDIATE
+    transaction, so concurrent workers serialise on the write lock.
+    Buckets untouched for `idle_ttl` seconds are swept now and then.
+    """
+
+    SWEEP_EVERY = 1000
+
+    def __init__(self, connect, clock=time.time, idle_ttl=24 * 3600):
+        self._connect = connect
+        self._clock = clock
+        self.idle_ttl = idle_ttl
+        self._takes = 0
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS ratelimit_buckets ("
+            " key TEXT PRIMARY KEY,"
+            " tokens REAL NOT NULL,"
+            " ts REAL NOT NULL)"
+        )
+
+    def take(self, key, policy, cost=1):
+        conn = self._connect()
+        now = self._clock()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, ts FROM ratelimit_buckets WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                tokens = float(policy.capacity)
+            else:
+                tokens = _refill(row[0], row[1], now, policy)
+
+            tokens, decision = _decide(tokens, policy, cost)
+            conn.execute(
+                "INSERT OR REPLACE INTO ratelimit_buckets (key, tokens, ts)"
+                " VALUES (?, ?, ?)",
+                (key, tokens, now),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        self._takes += 1
+        if self._takes % self.SWEEP_EVERY == 0:
+            conn.execute(
+                "DELETE FROM ratelimit_buckets WHERE ts < ?", (now - self.idle_ttl,)
+            )
+        return decision
+
+    def reset(self):
+        self._connect().execute("DELETE FROM ratelimit_buckets")
+
+
+# Refill + take in one round trip so concurrent nodes can't race each other.
+_REDIS_TAKE = """
+local key = KEYS[1]
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+
+local state = redis.call('HMGET', key, 't', 'ts')
+local tokens = tonumber(state[1])
+local ts = tonumber(state[2])
+if tokens == nil then
+  tokens = capacity
+  ts = now
+end
+
+local elapsed = now - ts
+if elapsed > 0 then
+  tokens = math.min(capacity, tokens + elapsed * rate)
+end
+
+local allowed = 0
+if tokens >= cost then
+  tokens = tokens - cost
+  allowed = 1
+end
+
+redis.call('HSET', key, 't', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', key, math.ceil((capacity - tokens) / rate * 1000) + 1000)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisBucketStore:
+    """
+    Token buckets shared through a Redis-protocol server.
+
+    `client` is anything with a redis-py style `eval(script, numkeys, *args)`
+    method, so a local stand-in such as fakeredis works too. Keys expire on
+    their own once the bucket would be full again.
+    """
+
+    def __init__(self, client, prefix="iq:rl:", clock=time.time):
+        self.client = client
+        self.prefix = prefix
+        self._clock = clock
+
+    def take(self, key, policy, cost=1):
+        allowed, tokens = self.client.eval(
+            _REDIS_TAKE,
+            1,
+            self.prefix + key,
+            policy.capacity,
+            policy.rate,
+            self._clock(),
+            cost,
+        )
+        tokens = float(tokens)
+        if int(allowed):
+            # _decide expects the pre-take amount
+            tokens += cost
+        return _decide(tokens, policy, cost)[1]
+
+    def reset(self):
+        for key in self.client.scan_iter(match=self.prefix + "*"):
+            self.client.delete(key)
+
+
+def store_from_url(url):
+    """
+    Build a store from RATELIMIT_STORAGE_URL.
+
+    "memory://" (the default) keeps buckets in this process; "redis://..."
+    needs the `redis` package.
+    """
+    if not url or url.startswith("memory://"):
+        return MemoryBucketStore()
+
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        try:
+            import redis
+        except ImportError as exc:
+            raise RuntimeError(
+                "RATELIMIT_STORAGE_URL points at Redis but the 'redis' "
+                "package is not installed"
+            ) from exc
+        return RedisBucketStore(redis.Redis.from_url(url))
+
+    raise ValueError(f"Unsupported RATELIMIT_STORAGE_URL: {url}")
+
+
+# -------------------------------------------------
+# Flask integration
+# -------------------------------------------------
+
+class RateLimiter:
+    """
+    Flask extension wiring policies + a store into route decorators.
+
+        limiter = RateLimiter(app)
+
+        @app.route("/api/auth/login", methods=["POST"])
+        @limiter.limit("auth")
+        def login(): ...
+
+    Config keys:
+      RATELIMIT_ENABLED      -- set False to turn every check into a no-op
+      RATELIMIT_STORAGE_URL  -- "memory://" or "redis://host:6379/0"; when
+                                unset, buckets live in the app's cache
+                                backend (app.extensions["cache"]) if any
+      RATELIMIT_POLICIES     -- {name: {"capacity", "period", "scope"}},
+                                merged key by key over DEFAULT_POLICIES
+      RATELIMIT_KEY_MAX      -- max keys kept by the in-memory store
+    """
+
+    def __init__(self, app=None, store=None):
+        self.store = store
+        self.policies = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("RATELIMIT_ENABLED", True)
+        app.config.setdefault("RATELIMIT_STORAGE_URL", None)
+        app.config.setdefault("RATELIMIT_POLICIES", {})
+        app.config.setdefault("RATELIMIT_KEY_MAX", 100_000)
+
+        # overrides may be partial, e.g. {"auth": {"capacity": 5}}
+        merged = {name: dict(spec) for name, spec in DEFAULT_POLICIES.items()}
+        for name, spec in app.config["RATELIMIT_POLICIES"].items():
+            merged.setdefault(name, {}).update(spec)
+        self.policies = {
+            name: Policy(name, **spec) for name, spec in merged.items()
+        }
+
+        if self.store is None:
+            url = app.config["RATELIMIT_STORAGE_URL"]
+            if not url and "cache" in app.extensions:
+                self.store = app.extensions["cache"].bucket_store()
+            else:
+                self.store = store_from_url(url)
+            # whichever way we got here, keep the in-process store capped
+            if isinstance(self.store, MemoryBucketStore):
+                self.store.max_keys = app.config["RATELIMIT_KEY_MAX"]
+
+        app.extensions["ratelimit"] = self
+        app.after_request(self._add_headers)
+
+    # ---------- keys ----------
+
+    @staticmethod
+    def client_ip():
+        # Behind a proxy, wrap the app in werkzeug's ProxyFix so remote_addr
+        # is the real client rather than trusting X-Forwarded-For here.
+        return request.remote_addr or "unknown"
+
+    @staticmethod
+    def key_for(policy, ip, identity=None):
+        if policy.scope == "user" and identity is not None:
+            return f"{policy.name}:u:{identity}"
+        return f"{policy.name}:ip:{ip}"
+
+    def _current_identity(self):
+        # @jwt_required() already ran: reuse its decoded token
+        if g.get("_jwt_extended_jwt") is not None:
+            return get_jwt_identity()
+        try:
+            verify_jwt_in_request(optional=True)
+            return get_jwt_identity()
+        except Exception:
+            # bad/expired tokens are rejected by the route itself
+            return None
+
+    # ---------- checking ----------
+
+    def take_for(self, policy_name, ip, identity=None, cost=1):
+        """
+        Take tokens outside a Flask request (e.g. from the ASGI handlers in
+        asgi.py). Returns the Decision.
+        """
+        policy = self.policies[policy_name]
+        return self.store.take(self.key_for(policy, ip, identity), policy, cost)
+
+    def hit(self, policy_name, cost=1):
+        """Take `cost` tokens for the current request under a policy."""
+        policy = self.policies[policy_name]
+        identity = self._current_identity() if policy.scope == "user" else None
+        decision = self.take_for(policy_name, self.client_ip(), identity, cost)
+        g._ratelimit = decision
+        return decision
+
+    def limit(self, policy_name, cost=1):
+        if policy_name not in self.policies and policy_name not in DEFAULT_POLICIES:
+            # fail at import time rather than on the first request
+            raise KeyError(f"Unknown rate limit policy: {policy_name}")
+
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not current_app.config["RATELIMIT_ENABLED"]:
+                    return fn(*args, **kwargs)
+
+                decision = self.hit(policy_name, cost)
+                if not decision.allowed:
+                    return jsonify(too_many_requests_body(decision)), 429
+                return fn(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    # ---------- response headers ----------
+
+    @staticmethod
+    def _add_headers(response):
+        decision = g.pop("_ratelimit", None)
+        if decision is None:
+            return response
+
+        response.headers.update(decision_headers(decision))
+        return response
+
+
+def too_many_requests_body(decision):
+    return {
+        "message": "Too many requests, slow down",
+        "retry_after": math.ceil(decision.retry_after),
+    }
+
+
+def decision_headers(decision):
+    """RateLimit-* (and Retry-After on a 429) headers for a Decision."""
+    headers = {
+        "RateLimit-Limit": str(decision.limit),
+        "RateLimit-Remaining": str(decision.remaining),
+        "RateLimit-Reset": str(math.ceil(decision.reset_after)),
+    }
+    if not decision.allowed:
+        headers["Retry-After"] = str(max(1, math.ceil(decision.retry_after)))
+    return headers
@@ -0,0 +1,135 @@
+// sw.js
+// Service worker: serves the app shell + local question banks from cache so
+// quizzes start instantly (and work offline), and replays queued score
+// submissions when the connection comes back.
+// Lives at the site root so its scope covers the whole app.
+
+importScripts("js/precache-manifest.js", "js/offline-queue.js");
+
+const STATIC_CACHE = `iq-static-${self.IQ_CACHE_VERSION}`;
+const QUESTIONS_CACHE = `iq-questions-${self.IQ_CACHE_VERSION}`;
+const RUNTIME_CACHE = `iq-runtime-${self.IQ_CACHE_VERSION}`;
+const CURRENT_CACHES = [STATIC_CACHE, QUESTIONS_CACHE, RUNTIME_CACHE];
+
+// Absolute URLs of the app shell, to spot them in fetch events
+const SHELL_URLS = new Set(
+  self.IQ_PRECACHE_STATIC.map((path) => new URL(path, self.registration.scope).href)
+);
+
+// ---------- Install: precache ----------
+
+self.addEventListener("install", (event) => {
+  event.waitUntil(
+    Promise.all([
+      caches
+        .open(STATIC_CACHE)
+        .then((cache) => cache.addAll(self.IQ_PRECACHE_STATIC)),
+      caches
+        .open(QUESTIONS_CACHE)
+        .then((cache) => cache.addAll(self.IQ_PRECACHE_QUESTIONS)),
+    ]).then(() => self.skipWaiting())
+  );
+});
+
+// ---------- Activate: drop caches from older versions ----------
+
+self.addEventListener("activate", (event) => {
+  event.waitUntil(
+    caches
+      .keys()
+      .then((names) =>
+        Promise.all(
+          names
+            .filter((name) => name.startsWith("iq-"))
+            .filter((name) => !CURRENT_CACHES.includes(name))
+            .map((name) => caches.delete(name))
+        )
+      )
+      .then(() => self.clients.claim())
+  );
+});
+
+// ---------- Fetch ----------
+
+// Cache first, fall back to network (and remember the answer)
+async function cacheFirst(request, cacheName) {
+  const cached = await caches.match(request);
+  if (cached) return cached;
+
+  const res = await fetch(request);
+  if (res.ok) {
+    const cache = await caches.open(cacheName);
+    cache.put(request, res.clone());
+  }
+  return res;
+}
+
+// Answer from cache straight away, refresh the cached copy in the background
+async function staleWhileRevalidate(request, cacheName, event) {
+  const cache = await caches.open(cacheName);
+  const cached = await cache.match(request);
+
+  const network = fetch(request)
+    .then((res) => {
+      if (res.ok) cache.put(request, res.clone());
+      return res;
+    })
+    .catch(() => null);
+
+  if (cached) {
+    event.waitUntil(network);
+    return cached;
+  }
+
+  const res = await network;
+  return res || Response.error();
+}
+
+self.addEventListener("fetch", (event) => {
+  const { request } = event;
+  if (request.method !== "GET") return;
+
+  const url = new URL(request.url);
+
+  // Only our own origin; Open Trivia DB etc. go straight to the network
+  if (url.origin !== self.location.origin) return;
+
+  // Never cache API responses (auth, scores, leaderboard…)
+  if (url.pathname.startsWith("/api/")) return;
+
+  if (url.pathname.startsWith("/data/")) {
+    event.respondWith(staleWhileRevalidate(request, QUESTIONS_CACHE, event));
+    return;
+  }
+
+  // Page navigations: fall back to the cached shell when offline
+  if (request.mode === "navigate") {
+    event.respondWith(
+      fetch(request).catch(() => caches.match("index.html"))
+    );
+    return;
+  }
+
+  // App shell (JS / CSS): serve the cached copy but always refresh it, so a
+  // deploy reaches clients on their next load even without a version bump
+  if (SHELL_URLS.has(url.origin + url.pathname)) {
+    event.respondWith(staleWhileRevalidate(request, STATIC_CACHE, event));
+    return;
+  }
+
+  // Everything else (images…) rarely changes: cache first
+  event.respondWith(cacheFirst(request, RUNTIME_CACHE));
+});
+
+// ---------- Background Sync: replay queued scores ----------
+
+self.addEventListener("sync", (event) => {
+  if (event.tag !== self.iqScoreQueue.SYNC_TAG) return;
+
+  event.waitUntil(
+    self.iqScoreQueue.replay().then(({ remaining }) => {
+      // rejecting makes the browser retry the sync later
+      if (remaining > 0) throw new Error("Scores still queued");
+    })
+  );
+});
@@ -0,0 +1,42 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# app.py and friends are plain modules next to this folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Never touch the real instance/iq.db when app.py gets imported
+_tmp = tempfile.mkdtemp(prefix="iq-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_tmp, 'test.db')}")
+os.environ.setdefault("CACHE_URL", "memory://")
+os.environ.pop("RATELIMIT_STORAGE_URL", None)
+
+
+class FakeClock:
+    """Stand-in for time.monotonic / time.time; move it with `clock.now += n`."""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def client():
+    """Test client on an empty database, rate limiting off."""
+    from app import app, db
+
+    app.config["RATELIMIT_ENABLED"] = False
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    yield app.test_client()
+    app.config["RATELIMIT_ENABLED"] = True
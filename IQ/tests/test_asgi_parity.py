@@ -0,0 +1,224 @@
+"""
+The async handlers in asgi.py must answer exactly like the Flask views they
+stand in for. Every case here goes to app.test_client() and to asgi.app
+(called in-process) and the two responses are compared.
+"""
+
+import asyncio
+from datetime import timedelta
+import json
+
+import pytest
+from flask_jwt_extended import create_access_token, create_refresh_token
+
+import asgi
+from app import app, limiter
+
+
+@pytest.fixture(scope="module")
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.run_until_complete(asgi.engine.dispose())
+    loop.close()
+
+
+@pytest.fixture
+def token(client):
+    res = client.post("/api/auth/register", json={"username": "sam", "password": "pw"})
+    return res.json["token"]
+
+
+def call_asgi(loop, method, path, headers=None, data=b"", query_string=""):
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": query_string.encode(),
+        "headers": [
+            (k.lower().encode("latin-1"), v.encode("latin-1"))
+            for k, v in (headers or {}).items()
+        ],
+        "client": ("127.0.0.1", 50000),
+        "server": ("localhost", 80),
+    }
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": data, "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    loop.run_until_complete(asgi.app(scope, receive, send))
+    start, body = sent[0], sent[1]
+    headers = {k.decode(): v.decode() for k, v in start["headers"]}
+    return start["status"], headers, body["body"]
+
+
+VOLATILE = {"token", "id", "created_at", "time"}
+
+
+def normalise(content_type, body):
+    if not content_type.startswith("application/json"):
+        return body
+
+    def scrub(value):
+        if isinstance(value, dict):
+            return {k: "*" if k in VOLATILE else scrub(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [scrub(v) for v in value]
+        return value
+
+    return scrub(json.loads(body))
+
+
+def both(client, loop, method, path, headers=None, data=b"", query_string=""):
+    """Send the same request to both apps; return (flask, asgi) summaries."""
+    headers = headers or {}
+    res = client.open(
+        path, method=method, headers=headers, data=data, query_string=query_string
+    )
+    flask_side = (
+        res.status_code,
+        res.content_type,
+        normalise(res.content_type, res.get_data()),
+    )
+
+    status, asgi_headers, body = call_asgi(loop, method, path, headers, data, query_string)
+    content_type = asgi_headers.get("content-type", "")
+    asgi_side = (status, content_type, normalise(content_type, body))
+    return flask_side, asgi_side
+
+
+def bearer(tok):
+    return {"Authorization": f"Bearer {tok}"}
+
+
+JSON = {"Content-Type": "application/json"}
+
+
+@pytest.mark.parametrize("path", ["/api/me", "/api/leaderboard"])
+def test_missing_or_foreign_auth_header(client, loop, path):
+    for headers in ({}, {"Authorization": "Token abc"}, {"Authorization": "Bearer"}):
+        flask_side, asgi_side = both(client, loop, "GET", path, headers)
+        assert flask_side[0] in (401, 422)
+        assert asgi_side == flask_side
+
+
+@pytest.mark.parametrize(
+    "method, path",
+    [("GET", "/api/health/"), ("GET", "/api/leaderboard/"), ("POST", "/api/scores/")],
+)
+def test_trailing_slash_is_not_the_same_route(client, loop, token, method, path):
+    headers = {**JSON, **bearer(token)}
+    flask_side, asgi_side = both(client, loop, method, path, headers, b"{}")
+    assert flask_side[0] in (404, 405)  # POST hits the GET-only static route
+    assert asgi_side == flask_side
+
+
+def test_bad_tokens(client, loop, token):
+    with app.app_context():
+        refresh = create_refresh_token(identity="1")
+        expired = create_access_token(identity="1", expires_delta=timedelta(seconds=-1))
+
+    for tok, status in (("not-a-jwt", 422), (refresh, 422), (expired, 401)):
+        flask_side, asgi_side = both(client, loop, "GET", "/api/leaderboard", bearer(tok))
+        assert flask_side[0] == status
+        assert asgi_side == flask_side
+
+
+def test_unknown_user(client, loop, token):
+    with app.app_context():
+        ghost = create_access_token(identity="999")
+    flask_side, asgi_side = both(client, loop, "GET", "/api/me", bearer(ghost))
+    assert flask_side[0] == 404
+    assert asgi_side == flask_side
+
+
+@pytest.mark.parametrize(
+    "headers, data",
+    [
+        (JSON, b"{not json"),
+        ({"Content-Type": "text/plain"}, b"username=sam"),
+        (JSON, json.dumps({"username": "sam"}).encode()),
+        (JSON, json.dumps({"username": "sam", "password": "nope"}).encode()),
+        (JSON, json.dumps({"username": "sam", "password": "pw"}).encode()),
+    ],
+)
+def test_login(client, loop, token, headers, data):
+    flask_side, asgi_side = both(client, loop, "POST", "/api/auth/login", headers, data)
+    assert asgi_side == flask_side
+
+
+def test_register_taken_and_malformed(client, loop, token):
+    taken = json.dumps({"username": "sam", "password": "x"}).encode()
+    for data in (taken, b"[1, 2"):
+        flask_side, asgi_side = both(
+            client, loop, "POST", "/api/auth/register", JSON, data
+        )
+        assert flask_side[0] == 400
+        assert asgi_side == flask_side
+
+
+@pytest.mark.parametrize(
+    "payload, extra",
+    [
+        ({"category_id": "gk", "score": 3, "total_questions": 5}, {}),
+        ({"category_id": "gk", "score": 9, "total_questions": 5}, {}),
+        ({"category_id": "gk", "score": 3, "total_questions": 5, "idempotency_key": 5}, {}),
+        ({"category_id": "gk", "score": 3, "total_questions": 5}, {"Idempotency-Key": "x" * 65}),
+    ],
+)
+def test_submit_score(client, loop, token, payload, extra):
+    headers = {**JSON, **bearer(token), **extra}
+    flask_side, asgi_side = both(
+        client, loop, "POST", "/api/scores", headers, json.dumps(payload).encode()
+    )
+    assert asgi_side == flask_side
+
+
+def test_submit_malformed_json(client, loop, token):
+    headers = {**JSON, **bearer(token)}
+    flask_side, asgi_side = both(client, loop, "POST", "/api/scores", headers, b"{")
+    assert flask_side[0] == 400
+    assert asgi_side == flask_side
+
+
+def test_leaderboard(client, loop, token):
+    client.post(
+        "/api/scores",
+        json={"category_id": "gk", "score": 3, "total_questions": 5},
+        headers=bearer(token),
+    )
+    flask_side, asgi_side = both(
+        client, loop, "GET", "/api/leaderboard", bearer(token),
+        query_string="category_id=gk&limit=oops",
+    )
+    assert flask_side[0] == 200
+    assert asgi_side == flask_side
+
+
+def test_rate_limit_headers_and_429(client, loop):
+    app.config["RATELIMIT_ENABLED"] = True
+    limiter.store.reset()
+    body = json.dumps({"username": "nobody", "password": "pw"}).encode()
+
+    status, headers, _ = call_asgi(loop, "POST", "/api/auth/login", JSON, body)
+    assert status == 401
+    assert "ratelimit-remaining" in headers
+
+    for _ in range(limiter.policies["auth"].capacity):
+        client.post("/api/auth/login", headers=JSON, data=body)
+
+    res = client.post("/api/auth/login", headers=JSON, data=body)
+    status, headers, raw = call_asgi(loop, "POST", "/api/auth/login", JSON, body)
+    assert res.status_code == status == 429
+    assert json.loads(raw) == res.json
+    assert headers["retry-after"]
+    limiter.store.reset()
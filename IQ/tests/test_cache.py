@@ -0,0 +1,66 @@
+from flask import Flask
+
+from cache import MemoryCache, init_app
+from ratelimit import RateLimiter
+
+
+def test_memory_cache_sweeps_expired_keys(clock):
+    cache = MemoryCache(clock=clock)
+
+    # what the leaderboard does: bump a version, cache a board under it
+    for _ in range(1000):
+        version = cache.incr("leaderboard:version")
+        cache.set(f"leaderboard:{version}:gk::10", [], ttl=60)
+        clock.now += 1
+
+    # only boards from the last minute (+ one sweep interval) survive
+    assert len(cache) < 1 + 60 + MemoryCache.SWEEP_EVERY
+    assert cache.get("leaderboard:version") == 1000
+
+
+def test_memory_cache_is_lru_capped(clock):
+    cache = MemoryCache(max_keys=3, clock=clock)
+    for key in "abc":
+        cache.set(key, key)
+    cache.get("a")  # "b" is now the least recently used
+    cache.set("d", "d")
+
+    assert len(cache) == 3
+    assert cache.get("b") is None
+    assert cache.get("a") == "a"
+
+
+def test_memory_cache_never_evicts_counters(clock):
+    cache = MemoryCache(max_keys=3, clock=clock)
+    cache.incr("leaderboard:version")
+    for i in range(10):
+        cache.set(f"board:{i}", i, ttl=60)
+
+    # an evicted version would restart at 0 and revive old boards
+    assert cache.get("leaderboard:version") == 1
+    assert cache.incr("leaderboard:version") == 2
+    assert cache.get("board:0") is None
+
+
+def test_memory_cache_ttl_and_get_or_set(clock):
+    cache = MemoryCache(clock=clock)
+    calls = []
+
+    def load():
+        calls.append(1)
+        return {"n": len(calls)}
+
+    assert cache.get_or_set("k", load, ttl=10) == {"n": 1}
+    assert cache.get_or_set("k", load, ttl=10) == {"n": 1}
+    clock.now += 11
+    assert cache.get_or_set("k", load, ttl=10) == {"n": 2}
+
+
+def test_key_max_applies_to_cache_backed_bucket_store():
+    app = Flask(__name__)
+    app.config["RATELIMIT_KEY_MAX"] = 42
+    init_app(app)
+    limiter = RateLimiter(app)
+
+    assert limiter.store is app.extensions["cache"].bucket_store()
+    assert limiter.store.max_keys == 42
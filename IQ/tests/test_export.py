@@ -0,0 +1,90 @@
+import csv
+import io
+import sqlite3
+
+import pytest
+
+from app import CustomQuiz, CustomQuizQuestion, Score, User, app, db, export_table
+
+
+@pytest.fixture
+def seeded():
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        user = User(username="alice", password_hash="x")
+        db.session.add(user)
+        db.session.flush()
+        db.session.bulk_save_objects(
+            [
+                Score(user_id=user.id, category_id="gk", score=i % 10, total_questions=10)
+                for i in range(12000)
+            ]
+        )
+        quiz = CustomQuiz(user_id=user.id, title="=HYPERLINK(\"x\")")
+        db.session.add(quiz)
+        db.session.flush()
+        db.session.add(
+            CustomQuizQuestion(
+                quiz_id=quiz.id,
+                question_text="@SUM(A1)",
+                option_a="-1",
+                option_b="+2",
+                option_c="fine",
+                option_d="4",
+                correct_index=0,
+            )
+        )
+        db.session.commit()
+        yield user
+
+
+def test_stalled_download_does_not_block_writers(seeded):
+    with app.app_context():
+        _, chunks = export_table("scores", "csv")
+        next(chunks)  # client reads one chunk, then stalls
+        path = db.engine.url.database
+
+    conn = sqlite3.connect(path, timeout=0.5)
+    try:
+        conn.execute(
+            "INSERT INTO scores (user_id, category_id, score, total_questions)"
+            " VALUES (?, 'gk', 1, 10)",
+            (seeded.id,),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def test_export_all_rows_and_incremental_cursor(seeded):
+    with app.app_context():
+        cursor, chunks = export_table("scores", "csv")
+        lines = b"".join(chunks).decode().splitlines()
+        assert len(lines) == 12001
+        assert cursor == 12000
+
+        cursor2, chunks = export_table("scores", "ndjson", since=11995)
+        assert len(b"".join(chunks).splitlines()) == 5
+        assert cursor2 == 12000
+
+
+def test_since_only_for_scores(seeded):
+    with app.app_context():
+        with pytest.raises(ValueError):
+            export_table("quizzes", "csv", since=1)
+        cursor, _ = export_table("quizzes", "csv")
+        assert cursor is None
+
+
+def test_csv_neutralises_formulas(seeded):
+    with app.app_context():
+        _, chunks = export_table("quizzes", "csv")
+        rows = list(csv.DictReader(io.StringIO(b"".join(chunks).decode())))
+
+    row = rows[0]
+    assert row["quiz_title"] == "'=HYPERLINK(\"x\")"
+    assert row["question_text"] == "'@SUM(A1)"
+    assert row["option_a"] == "'-1"
+    assert row["option_b"] == "'+2"
+    assert row["option_c"] == "fine"
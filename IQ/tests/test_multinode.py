@@ -0,0 +1,125 @@
+"""
+Two app instances ("nodes") sharing one database and one cache backend,
+the way several workers / boxes would behind a load balancer. "memory" is
+two workers that each have their own memory:// cache: reads must still be
+fresh, only the rate limits are per worker.
+"""
+
+import importlib.util
+import itertools
+import os
+
+import pytest
+
+import cache as cache_backend
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "app.py")
+_names = itertools.count()
+
+
+def load_node(monkeypatch, db_url, cache_url):
+    """Import a fresh copy of app.py as its own module (= one node)."""
+    monkeypatch.setenv("DATABASE_URL", db_url)
+    monkeypatch.setenv("CACHE_URL", cache_url)
+    name = f"iq_node_{next(_names)}"
+    spec = importlib.util.spec_from_file_location(name, APP_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def use_backend(node, backend):
+    """Point a node's cache and rate limiter at `backend`."""
+    node.cache = cache_backend.init_app(node.app, backend=backend)
+    node.limiter.store = backend.bucket_store()
+
+
+def make_nodes(kind, tmp_path, monkeypatch):
+    db_url = f"sqlite:///{tmp_path / 'shared.db'}"
+
+    if kind == "memory":
+        a = load_node(monkeypatch, db_url, "memory://")
+        b = load_node(monkeypatch, db_url, "memory://")
+    elif kind == "sqlite":
+        cache_url = f"sqlite:///{tmp_path / 'cache.db'}"
+        a = load_node(monkeypatch, db_url, cache_url)
+        b = load_node(monkeypatch, db_url, cache_url)
+    else:
+        fakeredis = pytest.importorskip("fakeredis")
+        server = fakeredis.FakeServer()
+        a = load_node(monkeypatch, db_url, "memory://")
+        b = load_node(monkeypatch, db_url, "memory://")
+        for node in (a, b):
+            use_backend(
+                node, cache_backend.RedisCache(fakeredis.FakeRedis(server=server))
+            )
+
+    assert a.app is not b.app
+    return a.app.test_client(), b.app.test_client()
+
+
+@pytest.fixture(params=["sqlite", "redis", "memory"])
+def nodes(request, tmp_path, monkeypatch):
+    return make_nodes(request.param, tmp_path, monkeypatch)
+
+
+@pytest.fixture(params=["sqlite", "redis"])
+def shared_nodes(request, tmp_path, monkeypatch):
+    return make_nodes(request.param, tmp_path, monkeypatch)
+
+
+def register(client):
+    res = client.post("/api/auth/register", json={"username": "nina", "password": "pw"})
+    return {"Authorization": f"Bearer {res.json['token']}"}
+
+
+def test_score_on_a_shows_on_b_leaderboard(nodes):
+    a, b = nodes
+    auth = register(a)
+
+    # warm B's cached (empty) board first
+    assert b.get("/api/leaderboard", headers=auth).json["scores"] == []
+
+    a.post(
+        "/api/scores",
+        json={"category_id": "gk", "score": 7, "total_questions": 10},
+        headers=auth,
+    )
+
+    scores = b.get("/api/leaderboard", headers=auth).json["scores"]
+    assert [s["score"] for s in scores] == [7]
+
+
+def test_quiz_edit_on_a_invalidates_b_cached_payload(nodes):
+    a, b = nodes
+    auth = register(a)
+    quiz_id = a.post("/api/my/quizzes", json={"title": "Old"}, headers=auth).json[
+        "quiz"
+    ]["id"]
+
+    # B caches the payload
+    assert b.get(f"/api/custom-quizzes/{quiz_id}/play", headers=auth).json["quiz"][
+        "title"
+    ] == "Old"
+
+    a.patch(f"/api/my/quizzes/{quiz_id}", json={"title": "New"}, headers=auth)
+
+    assert b.get(f"/api/custom-quizzes/{quiz_id}/play", headers=auth).json["quiz"][
+        "title"
+    ] == "New"
+
+
+def test_nodes_drain_one_shared_auth_bucket(shared_nodes):
+    a, b = shared_nodes
+    capacity = 10  # default "auth" policy
+
+    codes = [
+        (a if i % 2 else b)
+        .post("/api/auth/login", json={"username": "ghost", "password": "x"})
+        .status_code
+        for i in range(capacity + 1)
+    ]
+
+    # each node alone would allow `capacity`, together they share one bucket
+    assert codes[:capacity] == [401] * capacity
+    assert codes[capacity] == 429
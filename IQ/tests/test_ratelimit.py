@@ -0,0 +1,150 @@
+import pytest
+from flask import Flask, jsonify
+from flask_jwt_extended import JWTManager, create_access_token, jwt_required
+import flask_jwt_extended.view_decorators as jwt_views
+
+from ratelimit import (
+    MemoryBucketStore,
+    Policy,
+    RateLimiter,
+    RedisBucketStore,
+)
+
+
+def make_app(policies=None, store=None):
+    app = Flask(__name__)
+    app.config["JWT_SECRET_KEY"] = "test-secret-key-that-is-long-enough"
+    if policies is not None:
+        app.config["RATELIMIT_POLICIES"] = policies
+    JWTManager(app)
+    limiter = RateLimiter(app, store=store)
+
+    @app.route("/login", methods=["POST"])
+    @limiter.limit("auth")
+    def login():
+        return jsonify({"ok": True})
+
+    @app.route("/scores", methods=["POST"])
+    @jwt_required()
+    @limiter.limit("scores")
+    def scores():
+        return jsonify({"ok": True})
+
+    return app, limiter
+
+
+# ---------- bucket maths ----------
+
+def test_bucket_allows_burst_then_blocks(clock):
+    store = MemoryBucketStore(clock=clock)
+    policy = Policy("p", capacity=3, period=30)  # 1 token / 10s
+
+    decisions = [store.take("k", policy) for _ in range(4)]
+
+    assert [d.allowed for d in decisions] == [True, True, True, False]
+    assert [d.remaining for d in decisions] == [2, 1, 0, 0]
+    assert decisions[-1].retry_after == pytest.approx(10)
+    assert decisions[-1].reset_after == pytest.approx(30)
+
+
+def test_bucket_refills_over_time_up_to_capacity(clock):
+    store = MemoryBucketStore(clock=clock)
+    policy = Policy("p", capacity=2, period=20)  # 1 token / 10s
+
+    store.take("k", policy)
+    store.take("k", policy)
+    assert not store.take("k", policy).allowed
+
+    clock.now += 10
+    assert store.take("k", policy).allowed
+    assert not store.take("k", policy).allowed
+
+    clock.now += 1000
+    assert store.take("k", policy).remaining == 1  # capped at capacity
+
+
+def test_lru_eviction_drops_oldest_key(clock):
+    store = MemoryBucketStore(max_keys=2, clock=clock)
+    policy = Policy("p", capacity=1, period=60)
+
+    store.take("a", policy)
+    store.take("b", policy)
+    store.take("a", policy)  # touch "a" so "b" is the oldest
+    store.take("c", policy)
+
+    assert len(store) == 2
+    # "b" was evicted and starts over with a full bucket
+    assert store.take("b", policy).allowed
+    assert not store.take("c", policy).allowed
+
+
+def test_redis_store_on_fakeredis(clock):
+    fakeredis = pytest.importorskip("fakeredis")
+    store = RedisBucketStore(fakeredis.FakeRedis(), clock=clock)
+    policy = Policy("p", capacity=2, period=60)
+
+    decisions = [store.take("k", policy) for _ in range(3)]
+    assert [d.allowed for d in decisions] == [True, True, False]
+    assert decisions[-1].retry_after == pytest.approx(30)
+
+    clock.now += 30
+    assert store.take("k", policy).allowed
+
+
+# ---------- Flask integration ----------
+
+def test_429_with_retry_after_and_ratelimit_headers():
+    app, _ = make_app({"auth": {"capacity": 2, "period": 60}})
+    client = app.test_client()
+
+    first = client.post("/login")
+    assert first.status_code == 200
+    assert first.headers["RateLimit-Limit"] == "2"
+    assert first.headers["RateLimit-Remaining"] == "1"
+    assert "Retry-After" not in first.headers
+
+    client.post("/login")
+    blocked = client.post("/login")
+    assert blocked.status_code == 429
+    assert blocked.headers["Retry-After"] == "30"
+    assert blocked.headers["RateLimit-Remaining"] == "0"
+    assert blocked.json["retry_after"] == 30
+
+
+def test_user_scope_reuses_the_verified_jwt(monkeypatch):
+    app, _ = make_app({"scores": {"capacity": 1}})
+    with app.app_context():
+        alice, bob = create_access_token("alice"), create_access_token("bob")
+
+    decodes = []
+    real_decode = jwt_views.decode_token
+    monkeypatch.setattr(
+        jwt_views, "decode_token",
+        lambda *a, **kw: decodes.append(1) or real_decode(*a, **kw),
+    )
+    client = app.test_client()
+
+    def post(token):
+        return client.post("/scores", headers={"Authorization": f"Bearer {token}"})
+
+    assert post(alice).status_code == 200
+    assert len(decodes) == 1  # @jwt_required() only, not again by the limiter
+    assert post(alice).status_code == 429
+    assert post(bob).status_code == 200  # own bucket per identity
+
+
+def test_partial_policy_override_keeps_defaults():
+    _, limiter = make_app({"auth": {"capacity": 5}})
+
+    auth = limiter.policies["auth"]
+    assert auth.capacity == 5
+    assert auth.period == 60
+    assert auth.scope == "ip"
+
+
+def test_disabled_limiter_is_a_no_op():
+    app, _ = make_app({"auth": {"capacity": 1}})
+    app.config["RATELIMIT_ENABLED"] = False
+    client = app.test_client()
+
+    assert all(client.post("/login").status_code == 200 for _ in range(5))
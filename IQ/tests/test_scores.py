@@ -0,0 +1,40 @@
+import pytest
+
+
+@pytest.fixture
+def auth(client):
+    res = client.post("/api/auth/register", json={"username": "sam", "password": "pw"})
+    return {"Authorization": f"Bearer {res.json['token']}"}
+
+
+SCORE = {"category_id": "gk", "score": 3, "total_questions": 5}
+
+
+def test_same_idempotency_key_saves_once(client, auth):
+    headers = {**auth, "Idempotency-Key": "abc"}
+
+    first = client.post("/api/scores", json=SCORE, headers=headers)
+    replay = client.post("/api/scores", json=SCORE, headers=headers)
+
+    assert first.status_code == 201
+    assert replay.status_code == 200
+    assert replay.json["score"]["id"] == first.json["score"]["id"]
+
+    board = client.get("/api/leaderboard", headers=auth)
+    assert len(board.json["scores"]) == 1
+
+
+def test_without_key_every_post_saves(client, auth):
+    client.post("/api/scores", json=SCORE, headers=auth)
+    client.post("/api/scores", json=SCORE, headers=auth)
+
+    board = client.get("/api/leaderboard", headers=auth)
+    assert len(board.json["scores"]) == 2
+
+
+@pytest.mark.parametrize("bad_key", [5, ["a"], {"k": 1}, "x" * 65])
+def test_bad_idempotency_key_is_a_400(client, auth, bad_key):
+    res = client.post(
+        "/api/scores", json={**SCORE, "idempotency_key": bad_key}, headers=auth
+    )
+    assert res.status_code == 400